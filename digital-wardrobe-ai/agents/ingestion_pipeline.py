@@ -0,0 +1,144 @@
+"""
+Concurrent ingestion for a new clothing photo ("Process & Auto-Tag").
+
+Stages and what each one waits for:
+
+    clean ──┬── caption ─────────────┐
+            ├── ocr ─────────────────┼── enrich (GPT-4o)
+            └── save ──┬── vision ───┘
+                       └── web detection
+
+Model stages (rembg, BLIP, Tesseract, JPEG encode) run on a shared thread
+pool; torch and Tesseract release the GIL, so they overlap. Network stages
+run as coroutines: the GPT-4o call on the shared async OpenAI client, the
+Google Vision calls in the default executor. Every run goes through one
+long-lived event loop, so the async client and its pooled connections stay
+valid between Streamlit reruns. End-to-end latency is roughly the longest
+branch rather than the sum of the stages; run() reports both.
+"""
+import asyncio
+import contextvars
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+
+from agents.wardrobe_agent import process_image, extract_caption, extract_ocr, aenrich_metadata_with_openai
+from services.vision_api import web_detection, extract_vision_metadata
+from utils.metrics import instrument, current_flow, flow
+
+INGESTION_CPU_WORKERS = int(os.getenv("INGESTION_CPU_WORKERS", "3"))
+INGESTION_TEMP_DIR = "data/tmp"
+
+
+class IngestionPipeline:
+    def __init__(self, cpu_workers: int = INGESTION_CPU_WORKERS, temp_dir: str = INGESTION_TEMP_DIR):
+        self.cpu_pool = ThreadPoolExecutor(max_workers=cpu_workers, thread_name_prefix="ingest-cpu")
+        self.temp_dir = temp_dir
+        self._loop = None
+        self._loop_lock = threading.Lock()
+
+    def _event_loop(self) -> asyncio.AbstractEventLoop:
+        with self._loop_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name="ingest-io", daemon=True).start()
+        return self._loop
+
+    async def _stage(self, timings: dict, name: str, fn, *args, cpu: bool = False):
+        """Run one stage (a coroutine function, or a blocking one on the CPU pool or default executor)."""
+        start_time = time.perf_counter()
+        try:
+            if asyncio.iscoroutinefunction(fn):
+                return await fn(*args)
+            loop = asyncio.get_running_loop()
+            # Executor threads do not inherit context variables (the metrics flow) on their own
+            return await loop.run_in_executor(
+                self.cpu_pool if cpu else None, contextvars.copy_context().run, fn, *args
+            )
+        finally:
+            timings[name] = time.perf_counter() - start_time
+
+    def _save_temp(self, image: Image.Image) -> str:
+        os.makedirs(self.temp_dir, exist_ok=True)
+        fd, path = tempfile.mkstemp(suffix=".jpg", dir=self.temp_dir)
+        with os.fdopen(fd, "wb") as f:
+            image.save(f, format="JPEG")
+        return path
+
+    async def arun(self, image: Image.Image, flow_name: str = None) -> dict:
+        with flow(flow_name or current_flow()):
+            return await self._arun(image)
+
+    async def _arun(self, image: Image.Image) -> dict:
+        timings = {}
+        start_time = time.perf_counter()
+        processed = await self._stage(timings, "clean", process_image, image, cpu=True)
+
+        caption_task = asyncio.create_task(self._stage(timings, "caption", extract_caption, processed, cpu=True))
+        ocr_task = asyncio.create_task(self._stage(timings, "ocr", extract_ocr, processed, cpu=True))
+        tasks = [caption_task, ocr_task]
+        temp_path = None
+        try:
+            temp_path = await self._stage(timings, "save", self._save_temp, processed, cpu=True)
+            vision_task = asyncio.create_task(self._stage(timings, "vision", extract_vision_metadata, temp_path))
+            web_task = asyncio.create_task(self._stage(timings, "web_detection", web_detection, temp_path))
+            tasks += [vision_task, web_task]
+            # Enrichment is the only stage that needs the others' output
+            caption, ocr_text, vision = await asyncio.gather(caption_task, ocr_task, vision_task)
+            enriched = await self._stage(
+                timings, "enrich", aenrich_metadata_with_openai,
+                caption, ocr_text, vision.get("labels", []), vision.get("logos", [])
+            )
+            web_results = await web_task
+        finally:
+            # On failure, stop the branches still running and collect their errors, so nothing
+            # keeps going on the shared loop or logs "Task exception was never retrieved"
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            if temp_path:
+                os.remove(temp_path)
+
+        timings["total"] = time.perf_counter() - start_time
+        return {
+            "processed": processed,
+            "caption": caption,
+            "ocr_text": ocr_text,
+            "vision_metadata": vision,
+            "enriched": enriched,
+            "web_results": web_results,
+            "timings": timings,
+        }
+
+    def run(self, image: Image.Image) -> dict:
+        """
+        Ingest `image` and block until every stage is done. Returns processed,
+        caption, ocr_text, vision_metadata, enriched, web_results and timings
+        (seconds per stage plus "total").
+        """
+        with instrument("ingestion.total"):
+            # The loop thread has its own context, so hand it the caller's metrics flow
+            future = asyncio.run_coroutine_threadsafe(self.arun(image, current_flow()), self._event_loop())
+            result = future.result()
+        timings = result["timings"]
+        stages = sum(seconds for stage, seconds in timings.items() if stage != "total")
+        print(f"⏱️ Ingested in {timings['total']:.2f}s (stages sum to {stages:.2f}s): "
+              + ", ".join(f"{stage} {seconds:.2f}s" for stage, seconds in timings.items() if stage != "total"))
+        return result
+
+
+_pipeline = None
+_pipeline_lock = threading.Lock()
+
+
+def get_pipeline() -> IngestionPipeline:
+    """The process-wide pipeline (one CPU pool and event loop shared by all sessions)."""
+    global _pipeline
+    with _pipeline_lock:
+        if _pipeline is None:
+            _pipeline = IngestionPipeline()
+        return _pipeline
@@ -0,0 +1,262 @@
+"""
+Local first tier for parse_fashion_prompt.
+
+Most prompts only name an occasion and some of top / bottom / shoes, so a
+keyword lexicon parses them without an LLM call. parse_locally() returns an
+AgentClothingAnalysis plus a confidence in [0, 1]. The recommender only
+falls back to GPT-4 below LOCAL_PARSER_THRESHOLD. With use_clip=True,
+prompts that match no scenario keyword are scored zero-shot against the
+scenario labels with CLIP.
+
+Measure accuracy, coverage and the latency saved on the labelled set with
+
+    python -m agents.local_prompt_parser utils/prompt_parser_benchmark.jsonl [--llm]
+"""
+import argparse
+import json
+import os
+import re
+import time
+
+import numpy as np
+
+from models.fashion_models import AgentClothingAnalysis
+
+LOCAL_PARSER_THRESHOLD = float(os.getenv("LOCAL_PARSER_THRESHOLD", "0.8"))
+LOCAL_PARSER_USE_CLIP = os.getenv("LOCAL_PARSER_USE_CLIP", "0") == "1"
+
+CATEGORIES = ["top", "bottom", "shoes"]
+
+# Scenario label -> phrases that identify it (matched on word boundaries, case-insensitive)
+SCENARIO_LEXICON = {
+    "a beach party": ["beach", "beach party", "pool party", "seaside", "by the sea", "resort"],
+    "a formal dinner": ["formal dinner", "gala", "black tie", "fancy dinner", "fine dining", "banquet"],
+    "a date night": ["date night", "date", "romantic dinner", "anniversary"],
+    "a day at the office": ["office", "work", "workday", "business casual", "meeting", "conference"],
+    "a job interview": ["interview", "job interview"],
+    "a wedding": ["wedding", "bridesmaid", "wedding guest"],
+    "a workout at the gym": ["gym", "workout", "running", "training", "yoga", "exercise"],
+    "a casual weekend": ["casual", "weekend", "brunch", "errands", "everyday", "lazy sunday"],
+    "a night out at a party": ["party", "club", "clubbing", "night out", "birthday party", "concert", "festival"],
+    "a hike outdoors": ["hike", "hiking", "trail", "camping", "outdoors", "mountain"],
+    "a trip": ["travel", "trip", "vacation", "holiday", "flight", "airport", "sightseeing"],
+}
+
+CATEGORY_LEXICON = {
+    "top": ["top", "tops", "shirt", "shirts", "t-shirt", "tee", "blouse", "sweater", "hoodie", "jumper",
+            "cardigan", "jacket", "blazer", "polo", "tank top", "crop top", "coat"],
+    "bottom": ["bottom", "bottoms", "pants", "trousers", "jeans", "shorts", "skirt", "leggings", "chinos",
+               "joggers", "slacks"],
+    "shoes": ["shoes", "shoe", "sneakers", "trainers", "boots", "heels", "sandals", "loafers", "flats",
+              "footwear", "pumps", "oxfords"],
+}
+
+# Phrases that mark a garment as something the user already has
+OWNED_MARKERS = ["i have", "i already have", "i've got", "i have got", "i'm wearing", "i am wearing",
+                 "already picked", "already chose", "going with", "wearing my", "with my", "pair with"]
+# Phrases that switch back to asking for something
+REQUEST_MARKERS = ["suggest", "need", "looking for", "find", "want", "recommend", "show me", "what", "which"]
+# Asking for a complete look
+FULL_OUTFIT_MARKERS = ["outfit", "attire", "full look", "whole look", "everything", "head to toe",
+                       "what should i wear", "what to wear", "complete look", "dress me"]
+# Constructions the lexicon cannot resolve reliably
+HEDGES = ["not", "don't", "dont", "no", "without", "instead", "except", "but", "or"]
+
+
+def _pattern(phrases: list[str]) -> re.Pattern:
+    alternatives = sorted((re.escape(p) for p in phrases), key=len, reverse=True)
+    return re.compile(r"\b(?:" + "|".join(alternatives) + r")\b")
+
+
+_SCENARIO_PATTERNS = {label: _pattern(phrases) for label, phrases in SCENARIO_LEXICON.items()}
+_CATEGORY_PATTERNS = {cat: _pattern(words) for cat, words in CATEGORY_LEXICON.items()}
+_OWNED = _pattern(OWNED_MARKERS)
+_REQUEST = _pattern(REQUEST_MARKERS)
+_FULL_OUTFIT = _pattern(FULL_OUTFIT_MARKERS)
+_HEDGE = _pattern(HEDGES)
+_CLAUSE_SPLIT = re.compile(r"[,.;!?]|\b(?:but|so|then)\b")
+
+
+def _match_scenario(text: str) -> tuple[str, float]:
+    """Best scenario label by keyword, with confidence (longer, more specific phrases win)."""
+    matches = [
+        (match.start(), match.end(), label)
+        for label, pattern in _SCENARIO_PATTERNS.items()
+        for match in pattern.finditer(text)
+    ]
+    # "beach party" should not also count as "party"
+    matches = [
+        (start, end, label) for start, end, label in matches
+        if not any(s <= start and end <= e and (s, e) != (start, end) for s, e, _ in matches)
+    ]
+    if not matches:
+        return None, 0.0
+    start, end, best = max(matches, key=lambda m: m[1] - m[0])
+    distinct = len({label for _, _, label in matches})
+    # A multi-word phrase is specific; a lone word less so; several scenarios at once even less
+    confidence = 1.0 if " " in text[start:end] else 0.9
+    if distinct > 1:
+        confidence -= 0.15 * (distinct - 1)
+    return best, max(confidence, 0.0)
+
+
+_label_embeddings = None
+
+
+def _clip_scenario(text: str) -> tuple[str, float]:
+    """Zero-shot scenario label by CLIP text similarity; confidence is the softmax probability."""
+    global _label_embeddings
+    from models.clip_model import generate_clip_embeddings
+    labels = list(SCENARIO_LEXICON)
+    if _label_embeddings is None:
+        vectors = generate_clip_embeddings([f"an outfit for {label}" for label in labels])
+        _label_embeddings = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    query = generate_clip_embeddings([text])[0]
+    logits = 100.0 * (_label_embeddings @ (query / np.linalg.norm(query)))
+    probs = np.exp(logits - logits.max())
+    probs /= probs.sum()
+    best = int(np.argmax(probs))
+    return labels[best], float(probs[best])
+
+
+def _match_categories(text: str) -> tuple[list[str], list[str], float]:
+    """
+    (selected, requested, confidence). Each clause is read left to right:
+    garments after an ownership marker ("I have") are selected until a request
+    marker ("suggest") switches back; everything else is requested.
+    """
+    selected, requested = [], []
+    for clause in _CLAUSE_SPLIT.split(text):
+        events = [(m.start(), "owned") for m in _OWNED.finditer(clause)]
+        events += [(m.start(), "request") for m in _REQUEST.finditer(clause)]
+        events += [(m.start(), cat) for cat, pattern in _CATEGORY_PATTERNS.items() for m in pattern.finditer(clause)]
+        owned = False
+        for _, event in sorted(events):
+            if event in ("owned", "request"):
+                owned = event == "owned"
+            elif event not in selected and event not in requested:
+                (selected if owned else requested).append(event)
+
+    if _FULL_OUTFIT.search(text):
+        requested = [cat for cat in CATEGORIES if cat not in selected]
+        return selected, requested, 1.0
+    if requested:
+        return selected, requested, 0.95
+    if selected:
+        # Owns some pieces but names nothing to find: assume the rest
+        return selected, [cat for cat in CATEGORIES if cat not in selected], 0.75
+    # Nothing named at all: a whole outfit is the usual intent, but it is a guess
+    return [], list(CATEGORIES), 0.7
+
+
+def prompt_signature(prompt: str) -> str:
+    """
+    The scenario label and garment roles a prompt names by keyword, e.g.
+    "a date night|top|shoes". Prompts that differ here need different
+    answers however similar they read, so the prompt cache only matches
+    semantically within one signature.
+    """
+    text = prompt.lower()
+    scenario, _ = _match_scenario(text)
+    selected, requested, _ = _match_categories(text)
+    return "|".join([scenario or "", ",".join(sorted(selected)), ",".join(sorted(requested))])
+
+
+def parse_locally(prompt: str, use_clip: bool = LOCAL_PARSER_USE_CLIP) -> tuple[AgentClothingAnalysis, float]:
+    """Parse `prompt` without an LLM. Returns (analysis, confidence)."""
+    text = prompt.lower()
+    scenario, scenario_confidence = _match_scenario(text)
+    if scenario is None and use_clip:
+        scenario, scenario_confidence = _clip_scenario(text)
+        scenario_confidence *= 0.9
+    if scenario is None:
+        scenario = prompt.strip()
+
+    selected, requested, category_confidence = _match_categories(text)
+    confidence = min(scenario_confidence, category_confidence)
+    if _HEDGE.search(text):
+        confidence -= 0.3
+    analysis = AgentClothingAnalysis(
+        scenario=scenario,
+        selected_categories=selected,
+        requested_categories=requested,
+    )
+    return analysis, max(confidence, 0.0)
+
+
+def run_benchmark(path: str, threshold: float = LOCAL_PARSER_THRESHOLD, use_clip: bool = False,
+                  llm_parse=None, llm_latency: float = 2.5) -> dict:
+    """
+    Score the local tier on a labelled JSONL set. Each line holds prompt,
+    scenario (a SCENARIO_LEXICON label), selected_categories and
+    requested_categories. Prompts below `threshold` count as LLM fallbacks.
+    If `llm_parse` is given the LLM's latency is measured on those; otherwise
+    `llm_latency` seconds is assumed.
+    """
+    with open(path, encoding="utf-8") as f:
+        cases = [json.loads(line) for line in f if line.strip()]
+
+    local_times, llm_times = [], []
+    covered = correct = correct_covered = 0
+    for case in cases:
+        start_time = time.perf_counter()
+        analysis, confidence = parse_locally(case["prompt"], use_clip=use_clip)
+        local_times.append(time.perf_counter() - start_time)
+
+        right = (
+            analysis.scenario == case["scenario"]
+            and sorted(analysis.selected_categories) == sorted(case["selected_categories"])
+            and sorted(analysis.requested_categories) == sorted(case["requested_categories"])
+        )
+        correct += right
+        if confidence >= threshold:
+            covered += 1
+            correct_covered += right
+        elif llm_parse is not None:
+            start_time = time.perf_counter()
+            llm_parse(case["prompt"])
+            llm_times.append(time.perf_counter() - start_time)
+
+    llm_mean = float(np.mean(llm_times)) if llm_times else llm_latency
+    return {
+        "cases": len(cases),
+        "threshold": threshold,
+        "accuracy": correct / len(cases),
+        "coverage": covered / len(cases),
+        "accuracy_when_local": correct_covered / covered if covered else 0.0,
+        "local_ms_mean": 1000 * float(np.mean(local_times)),
+        "llm_s_mean": llm_mean,
+        "llm_latency_measured": bool(llm_times),
+        "seconds_saved": covered * llm_mean,
+        "seconds_saved_per_prompt": covered * llm_mean / len(cases),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the local prompt parser on a labelled set.")
+    parser.add_argument("path", nargs="?", default="utils/prompt_parser_benchmark.jsonl")
+    parser.add_argument("--threshold", type=float, default=LOCAL_PARSER_THRESHOLD)
+    parser.add_argument("--clip", action="store_true", help="Use CLIP zero-shot for unmatched scenarios")
+    parser.add_argument("--llm", action="store_true", help="Measure real GPT-4 latency on the fallbacks")
+    parser.add_argument("--llm-latency", type=float, default=2.5, help="Assumed GPT-4 seconds per prompt")
+    args = parser.parse_args()
+
+    llm_parse = None
+    if args.llm:
+        from agents.recommender_agent import parse_fashion_prompt_llm
+        llm_parse = parse_fashion_prompt_llm
+    report = run_benchmark(args.path, args.threshold, args.clip, llm_parse, args.llm_latency)
+
+    print(f"📊 {report['cases']} prompts, threshold {report['threshold']:.2f}")
+    print(f"   accuracy (all, local answer):   {report['accuracy']:.1%}")
+    print(f"   handled locally:                {report['coverage']:.1%}")
+    print(f"   accuracy when handled locally:  {report['accuracy_when_local']:.1%}")
+    print(f"   local parse:                    {report['local_ms_mean']:.3f} ms/prompt")
+    print(f"   LLM parse ({'measured' if report['llm_latency_measured'] else 'assumed'}):"
+          f"{'':<11}{report['llm_s_mean']:.2f} s/prompt")
+    print(f"   latency saved:                  {report['seconds_saved']:.1f} s total, "
+          f"{report['seconds_saved_per_prompt']:.2f} s/prompt")
+
+
+if __name__ == "__main__":
+    main()
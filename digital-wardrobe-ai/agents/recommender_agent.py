@@ -1,115 +1,38 @@
-from models.clip_model import generate_clip_embedding
+from models.clip_model import generate_clip_embedding, generate_clip_embeddings
 from models.fashion_models import AgentClothingAnalysis
+from utils.search_indexer import index_csv
+from utils.vector_store import ElasticsearchVectorStore, get_vector_store
+from services.elasticsearch_client import get_client, ensure_index
+from utils.prompt_cache import get_prompt_cache
+from agents.local_prompt_parser import parse_locally, prompt_signature, LOCAL_PARSER_THRESHOLD
+from services.openai_client import chat_completion
+from utils.metrics import instrument
 from elasticsearch import Elasticsearch
 from dotenv import load_dotenv
-from openai import OpenAI
-import openai
-import pandas as pd
+import hashlib
 import json
-import os
-import urllib3
-
-# Suppress SSL warnings for self-signed certificates
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
 # Load environment variables
 load_dotenv()
 
-# Environment config
-ELASTICSEARCH_HOST = os.getenv("ELASTICSEARCH_HOST")
-ELASTICSEARCH_USERNAME = os.getenv("ELASTICSEARCH_USERNAME")
-ELASTICSEARCH_PASSWORD = os.getenv("ELASTICSEARCH_PASSWORD")
-openai.api_key = os.getenv("OPENAI_API_KEY")
-
 CATEGORIES = ["top", "bottom", "shoes"]
+# Fields the recommendation cards read; everything else (vectors included) stays on the server
+RECOMMENDATION_FIELDS = ["id", "user_id", "type", "sub_type", "brand", "color", "image_url"]
 
-# Elasticsearch client
+# Elasticsearch client (shared per process, see services/elasticsearch_client.py)
 def initialize():
-    es_client = Elasticsearch(
-        ELASTICSEARCH_HOST,
-        basic_auth=(ELASTICSEARCH_USERNAME, ELASTICSEARCH_PASSWORD),
-        verify_certs=False,
-        request_timeout=10000,
-        headers={
-            "Accept": "application/vnd.elasticsearch+json; compatible-with=8",
-            "Content-Type": "application/vnd.elasticsearch+json; compatible-with=8"
-        }
-    )
+    es_client = get_client()
     if not es_client.ping():
         raise ConnectionError("❌ Failed to connect to Elasticsearch")
     return es_client
 
-# Create index with schema
+# Create index with schema (once per process)
 def create_index(es, index_name):
-    if not es.indices.exists(index=index_name):
-        mapping = {
-            "mappings": {
-                "properties": {
-                    "id": {"type": "keyword"},
-                    "user_id": {"type": "keyword"},
-                    "filename": {"type": "text"},
-                    "image_url": {"type": "text"},
-                    "type": {"type": "keyword"},
-                    "sub_type": {"type": "keyword"},
-                    "color": {"type": "keyword"},
-                    "color_hex": {"type": "keyword"},
-                    "material": {"type": "keyword"},
-                    "pattern": {"type": "keyword"},
-                    "size": {"type": "keyword"},
-                    "brand": {"type": "text"},
-                    "style": {"type": "keyword"},
-                    "season": {"type": "keyword"},
-                    "mood": {"type": "keyword"},
-                    "favorite": {"type": "boolean"},
-                    "date_added": {"type": "date"},
-                    "last_worn": {"type": "date"},
-                    "wear_count": {"type": "integer"},
-                    "embedding": {
-                        "type": "dense_vector",
-                        "dims": 512,
-                        "index": True,
-                        "similarity": "cosine"
-                    }
-                }
-            }
-        }
-        es.indices.create(index=index_name, body=mapping)
-        print(f"✅ Index '{index_name}' created.")
-    else:
-        print(f"ℹ️ Index '{index_name}' already exists.")
+    ensure_index(index_name, es)
 
 # Insert items from CSV with CLIP embeddings
-def insert_items_from_csv(csv_path):
-    df = pd.read_csv(csv_path)
-    for _, row in df.iterrows():
-        
-        print(row.to_json(orient='records', lines=False, indent=2))
-        document = {
-            "id": row["id"],
-            "user_id": row["user_id"],
-            "filename": row["filename"],
-            "image_url": row["image_url"],
-            "type": row["type"],
-            "sub_type": row["sub_type"],
-            "color": row["color"],
-            "color_hex": row["color_hex"],
-            "material": row["material"],
-            "pattern": row["pattern"],
-            "size": row["size"],
-            "brand": row["brand"],
-            "style": row["style"],
-            "season": row["season"],
-            "mood": row["mood"],
-            "favorite": bool(row["favorite"]),
-            "date_added": row["date_added"],
-            "last_worn": row["last_worn"] if pd.notnull(row["last_worn"]) else None,
-            "wear_count": int(row["wear_count"])
-        }
-        text = f"{document['color']} {document['material']} {document['pattern']} {document['type']} from {document['brand']}, style: {document['style']}, season: {document['season']}, mood: {document['mood']}"
-        embedding = generate_clip_embedding(text)
-        document["embedding"] = embedding
-        es.index(index=index_name, id=document["id"], document=document)
-        print(f"✅ Inserted: {document['brand']}_{document['color']}_{document['type']}")
+def insert_items_from_csv(csv_path, index_name="digital_wardrobe", chunk_size=500):
+    return index_csv(csv_path, index_name, chunk_size=chunk_size)
 
 # Find and delete items by name
 def find_and_delete_by_name(name):
@@ -120,21 +43,46 @@ def find_and_delete_by_name(name):
         print(f"🗑️ Deleted item with ID: {doc_id}")
 
 # Search for similar items based on text description
-def search_similar_items(query_text, category, es: Elasticsearch, index_name="digital_wardrobe"):
+def search_similar_items(query_text, category, es: Elasticsearch = None, index_name="digital_wardrobe",
+                         user_id: str = None, k: int = 3, num_candidates: int = 50,
+                         source_fields: list[str] = RECOMMENDATION_FIELDS):
+    """
+    The `k` items of `category` (owned by `user_id`, if given) nearest to
+    `query_text`. Both filters run inside the kNN query, so all k results
+    match. Uses `es` if given, else the configured vector store.
+    """
     embedding = generate_clip_embedding(query_text)
+    store = ElasticsearchVectorStore(es, index_name) if es is not None else get_vector_store(index_name)
 
-    body = {
-        "knn": {
-            "field": "embedding",
-            "query_vector": embedding,
-            "k": 30,
-            "num_candidates": 100
-        }
-    }
+    filters = {"type": category}
+    if user_id:
+        filters["user_id"] = user_id
+    return store.knn(embedding, k=k, num_candidates=num_candidates,
+                     filters=filters, source_fields=source_fields)
 
-    hits = es.search(index=index_name, body=body)["hits"]["hits"]
-    filtered = [h for h in hits if h["_source"]["type"] == category]
-    return filtered[:3]
+def recommend_all(analysis: AgentClothingAnalysis, selections: dict = None, es: Elasticsearch = None,
+                  index_name="digital_wardrobe", user_id: str = None, k: int = 3, num_candidates: int = 50,
+                  source_fields: list[str] = RECOMMENDATION_FIELDS) -> dict:
+    """
+    Candidates for every requested category at once: {category: hits}.
+    All prompts are embedded in one batch and searched in one multi-search.
+    """
+    categories = [c for c in analysis.requested_categories if c not in (selections or {})]
+    if not categories:
+        return {}
+    selected_desc = ", ".join((selections or {}).values()) or ", ".join(analysis.selected_categories) or "nothing"
+    prompts = [f"The user has selected: {selected_desc}. Suggest a {cat} for: {analysis.scenario}." for cat in categories]
+    embeddings = generate_clip_embeddings(prompts)
+
+    store = ElasticsearchVectorStore(es, index_name) if es is not None else get_vector_store(index_name)
+    queries = []
+    for cat, embedding in zip(categories, embeddings):
+        filters = {"type": cat}
+        if user_id:
+            filters["user_id"] = user_id
+        queries.append((embedding, filters))
+    results = store.knn_many(queries, k=k, num_candidates=num_candidates, source_fields=source_fields)
+    return dict(zip(categories, results))
 
 
 
@@ -158,16 +106,47 @@ Return only valid JSON using this schema:
 }
 """
 
+PROMPT_MODEL = "gpt-4"
+# Cached answers are only valid for the model and system prompt that produced them
+PROMPT_CACHE_NAMESPACE = f"parse_fashion_prompt:{PROMPT_MODEL}:{hashlib.sha256(system_prompt.encode()).hexdigest()[:12]}"
+
 def parse_fashion_prompt(user_input: str) -> AgentClothingAnalysis:
-    client = OpenAI(api_key=openai.api_key)
-    response = client.chat.completions.create(
-        model="gpt-4",
+    """
+    Tiered, cheapest first: the exact prompt cache, the local lexicon parser
+    when it is confident enough, the semantic prompt cache (a CLIP embed),
+    then GPT-4. Only GPT-4 answers are cached; local parses are cheaper to
+    redo than to embed and store.
+    """
+    with instrument("prompt.parse") as span:
+        cache = get_prompt_cache(PROMPT_CACHE_NAMESPACE, signature_fn=prompt_signature)
+        cached = cache.get(user_input, semantic=False)
+        if cached is not None:
+            span.set(cache_hits=1)
+            return AgentClothingAnalysis(**cached)
+
+        with instrument("prompt.parse_local"):
+            analysis, confidence = parse_locally(user_input)
+        if confidence >= LOCAL_PARSER_THRESHOLD:
+            span.set(cache_misses=1)
+            return analysis
+
+        cached = cache.get_similar(user_input)
+        span.set(cache_hits=int(cached is not None), cache_misses=int(cached is None))
+        if cached is not None:
+            return AgentClothingAnalysis(**cached)
+
+        analysis = parse_fashion_prompt_llm(user_input)
+        cache.put(user_input, analysis.model_dump())
+        return analysis
+
+def parse_fashion_prompt_llm(user_input: str) -> AgentClothingAnalysis:
+    response = chat_completion(
+        model=PROMPT_MODEL,
         messages=[
             {"role": "system", "content": system_prompt},
             {"role": "user", "content": user_input}
         ]
     )
-    print("Response from OpenAI:", response)
     content = response.choices[0].message.content
     parsed = json.loads(content)
     return AgentClothingAnalysis(**parsed)
@@ -206,7 +185,7 @@ def handle_user_prompt(prompt: str):
     return recommendations
 
 
-def handle_user_step(analysis: AgentClothingAnalysis, selections: dict):
+def handle_user_step(analysis: AgentClothingAnalysis, selections: dict, user_id: str = None):
     """
     Determine next category and fetch 3 recommendations.
     Returns (category, list_of_hits) or (None, None) when done.
@@ -217,16 +196,15 @@ def handle_user_step(analysis: AgentClothingAnalysis, selections: dict):
     cat = remaining[0]
     selected_desc = ", ".join(selections.values()) or "nothing"
     prompt = f"The user has selected: {selected_desc}. Suggest a {cat} for: {analysis.scenario}."
-    recs = search_similar_items(prompt, cat)
+    recs = search_similar_items(prompt, cat, user_id=user_id)
     return cat, recs
 
 
 
 if __name__ == "__main__":
-    es = initialize()
+    es = None
     index_name = "digital_wardrobe"
-    create_index(es, index_name)
-    insert_items_from_csv("Generated_Wardrobe_Items.csv")
+    insert_items_from_csv("Generated_Wardrobe_Items.csv", index_name)
     
     user_prompt = input("Enter your fashion prompt: ")
     recommendations = handle_user_prompt(user_prompt)
\ No newline at end of file
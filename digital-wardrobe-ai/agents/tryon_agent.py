@@ -1,6 +1,6 @@
 # generator_agent.py
 import base64
-from openai import OpenAI
+from services.openai_client import chat_completion, image_generation
 import os
 import torch
 from PIL import Image
@@ -8,10 +8,6 @@ from diffusers import StableDiffusionXLPipeline, ControlNetModel
 from ip_adapter import IPAdapterXL
 from controlnet_aux.open_pose import OpenposeDetector
 import open_clip
-# Load environment variables
-from dotenv import load_dotenv
-load_dotenv()
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))  # Set securely
 
 def generate_tryon_image(
     person_img_path: str,
@@ -108,7 +104,7 @@ def generate_prompt_from_images(person_image_path, shirt_image_path):
     ]
 
     print("🧠 Generating image prompt with GPT-4 Vision...")
-    response = client.chat.completions.create(
+    response = chat_completion(
         model="gpt-4-turbo",
         messages=messages,
         max_tokens=600,
@@ -120,7 +116,7 @@ def generate_prompt_from_images(person_image_path, shirt_image_path):
 # === Function 2: Generate image with DALL·E 3
 def generate_image_with_dalle3(prompt, output_path="outputs/dalle_result.txt"):
     print("🎨 Generating image with DALL·E 3...")
-    response = client.images.generate(
+    response = image_generation(
         model="dall-e-3",
         prompt=prompt,
         n=1,
@@ -1,43 +1,47 @@
 import uuid, os
+import argparse
 from PIL import Image
 from rembg import remove
 import pytesseract
-from transformers import BlipProcessor, BlipForConditionalGeneration
-from utils.db import init_db, insert_item, attach_tag_to_item
-from openai import OpenAI
+from models.registry import get_model
+from models.clip_model import generate_clip_embeddings, generate_clip_image_embeddings
+from utils.db import (
+    WARDROBE_DIR, insert_item, attach_tags, transaction, upsert_item_embeddings,
+    get_item_embeddings, get_items_by_ids, get_items_missing_embedding, record_embedding_failures
+)
+from utils.embeddings import item_embedding_text, ITEM_EMBEDDING_MODEL
+from utils import search_sync
+from utils.metrics import instrument
+from services.openai_client import chat_completion, achat_completion
+import numpy as np
+import requests
 import datetime
 import json
-from dotenv import load_dotenv
+import io
 
-# Initialize DB
-init_db()
-
-# Load BLIP model
-processor = BlipProcessor.from_pretrained("Salesforce/blip-image-captioning-base")
-model = BlipForConditionalGeneration.from_pretrained("Salesforce/blip-image-captioning-base")
-
-WARDROBE_DIR = "data/user_wardrobes"
-
-# Load OpenAI credentials
-load_dotenv()
-openai_key = os.getenv("OPENAI_API_KEY")
-openai_client = OpenAI(api_key=openai_key)
+# Wait before retrying an item whose photo could not be loaded; doubles per failure
+BACKFILL_RETRY_SECONDS = 3600
+BACKFILL_RETRY_MAX_SECONDS = 7 * 24 * 3600
 
+@instrument("rembg.remove")
 def process_image(img: Image.Image) -> Image.Image:
-    no_bg = remove(img.convert("RGB"))
+    no_bg = remove(img.convert("RGB"), session=get_model("rembg"))
     white_bg = Image.new("RGB", no_bg.size, (255,255,255))
     white_bg.paste(no_bg, mask=no_bg.split()[3])
     return white_bg
 
+@instrument("blip.caption")
 def extract_caption(img: Image.Image) -> str:
+    model, processor = get_model("blip")
     inputs = processor(images=img, return_tensors="pt")
     out = model.generate(**inputs, max_new_tokens=20)
     return processor.decode(out[0], skip_special_tokens=True)
 
+@instrument("tesseract.ocr")
 def extract_ocr(img: Image.Image) -> str:
     return pytesseract.image_to_string(img).strip()
 
-def enrich_metadata_with_openai(
+def _metadata_request(
     caption: str,
     ocr_text: str,
     vision_labels: list[str],
@@ -71,7 +75,7 @@ Detected Logos: {', '.join(vision_logos)}
 Based on this information, extract metadata fields like type, sub_type, color, size, style, season, brand, material, mood, etc.
   """
 
-    response = openai_client.chat.completions.create(
+    return dict(
         model="gpt-4o",
         messages=[{
             "role": "user",
@@ -80,6 +84,24 @@ Based on this information, extract metadata fields like type, sub_type, color, s
         functions=[{"name": "extract_metadata", "parameters": schema}],
         function_call={"name": "extract_metadata"}
     )
+
+def enrich_metadata_with_openai(
+    caption: str,
+    ocr_text: str,
+    vision_labels: list[str],
+    vision_logos: list[str]
+) -> dict:
+    response = chat_completion(**_metadata_request(caption, ocr_text, vision_labels, vision_logos))
+    return json.loads(response.choices[0].message.function_call.arguments)
+
+async def aenrich_metadata_with_openai(
+    caption: str,
+    ocr_text: str,
+    vision_labels: list[str],
+    vision_logos: list[str]
+) -> dict:
+    """enrich_metadata_with_openai() on the shared async client."""
+    response = await achat_completion(**_metadata_request(caption, ocr_text, vision_labels, vision_logos))
     return json.loads(response.choices[0].message.function_call.arguments)
 
 def save_item_with_metadata(
@@ -100,6 +122,7 @@ def save_item_with_metadata(
         "id": item_id,
         "user_id": user_id,
         "filename": filename,
+        "image_url": image_url,
         "type": metadata.get("type"),
         "sub_type": metadata.get("sub_type"),
         "color": metadata.get("color"),
@@ -111,14 +134,105 @@ def save_item_with_metadata(
         "style": metadata.get("style"),
         "season": metadata.get("season"),
         "mood": metadata.get("mood"),
+        "caption": metadata.get("caption"),
         "favorite": metadata.get("favorite", 0),
         "date_added": metadata.get("date_added", datetime.datetime.now().isoformat()),
         "last_worn": None,
         "wear_count": 0
     }
 
-    insert_item(item_record)
-
-
-
-    return item_record
\ No newline at end of file
+    # Run CLIP before taking the write lock
+    embedding_rows = item_embedding_rows([item_record], [image])
+    with transaction():
+        insert_item(item_record)
+        attach_tags(item_id, tags or [])
+        upsert_item_embeddings(embedding_rows)
+    item_record["tags"] = ",".join(tags or [])
+    search_sync.notify()
+
+    return item_record
+
+def item_embedding_rows(items: list[dict], images: list[Image.Image]) -> list[tuple]:
+    """CLIP text and image vectors for `items`, batched, as item_embeddings rows."""
+    text_vectors = generate_clip_embeddings([item_embedding_text(item) for item in items])
+    image_vectors = generate_clip_image_embeddings(images)
+    rows = []
+    for item, text_vector, image_vector in zip(items, text_vectors, image_vectors):
+        rows.append((item["id"], "text", item["user_id"], ITEM_EMBEDDING_MODEL, text_vector.tobytes()))
+        rows.append((item["id"], "image", item["user_id"], ITEM_EMBEDDING_MODEL, image_vector.tobytes()))
+    return rows
+
+def load_item_image(item: dict):
+    """The saved item photo, falling back to its image_url; None if neither is reachable."""
+    path = os.path.join(WARDROBE_DIR, item["user_id"], item["filename"])
+    try:
+        if os.path.exists(path):
+            return Image.open(path)
+        if item.get("image_url"):
+            resp = requests.get(item["image_url"], timeout=10)
+            resp.raise_for_status()
+            return Image.open(io.BytesIO(resp.content))
+    except Exception as e:
+        print(f"⚠️ Could not load image for {item['id']}: {e}")
+    return None
+
+def backfill_item_embeddings(user_id: str = None, batch_size: int = 32) -> int:
+    """
+    Embed saved items that have no image vector from the active backend yet.
+    Returns the number embedded. Runs in the background at app startup when
+    items are missing one, or by hand:
+
+        python -m agents.wardrobe_agent backfill [--user-id <user_id>]
+
+    Items whose photo cannot be loaded are recorded and skipped until their
+    retry time, which backs off from BACKFILL_RETRY_SECONDS up to BACKFILL_RETRY_MAX_SECONDS.
+    """
+    done = 0
+    while True:
+        pending = get_items_missing_embedding("image", user_id, limit=batch_size, model=ITEM_EMBEDDING_MODEL)
+        if not pending:
+            return done
+        loaded = [(item, load_item_image(item)) for item in pending]
+        failed = [item["id"] for item, image in loaded if image is None]
+        if failed:
+            record_embedding_failures(failed, "image", BACKFILL_RETRY_SECONDS, BACKFILL_RETRY_MAX_SECONDS)
+        loaded = [(item, image) for item, image in loaded if image is not None]
+        if loaded:
+            upsert_item_embeddings(item_embedding_rows([item for item, _ in loaded], [image for _, image in loaded]))
+            done += len(loaded)
+
+def find_similar_in_closet(user_id: str, image: Image.Image, k: int = 6) -> list[tuple[dict, float]]:
+    """
+    Closest items in the user's closet to a photo, by cosine similarity of
+    CLIP image embeddings. Runs fully locally. Returns [(item, score)], best first.
+    """
+    stored = get_item_embeddings(user_id, "image", ITEM_EMBEDDING_MODEL)
+    if not stored:
+        return []
+    item_ids = [item_id for item_id, _ in stored]
+    matrix = np.frombuffer(b"".join(blob for _, blob in stored), dtype=np.float32).reshape(len(stored), -1)
+    matrix = matrix / np.linalg.norm(matrix, axis=1, keepdims=True)
+
+    query = generate_clip_image_embeddings([image])[0]
+    scores = matrix @ (query / np.linalg.norm(query))
+    top = np.argsort(-scores)[:k]
+
+    items = get_items_by_ids([item_ids[i] for i in top])
+    return [(items[item_ids[i]], float(scores[i])) for i in top if item_ids[i] in items]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Wardrobe item maintenance.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    backfill = commands.add_parser("backfill", help="Embed item photos saved before image embeddings existed")
+    backfill.add_argument("--user-id", help="Only this user's items")
+    args = parser.parse_args()
+
+    if args.command == "backfill":
+        from utils.db import init_db
+        init_db()
+        print(f"✅ Embedded {backfill_item_embeddings(args.user_id)} item photos")
+
+
+if __name__ == "__main__":
+    main()
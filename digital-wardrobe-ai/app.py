@@ -1,10 +1,42 @@
+import os
+import threading
 import streamlit as st
 
 # 1️⃣ Must be the very first Streamlit call
 st.set_page_config(page_title="Digital Wardrobe", page_icon="🧥", layout="wide")
 
 # 2️⃣ Import your views after set_page_config
-from views import login, my_closet, add_clothe, recommendation
+from views import login, my_closet
+from utils.db import init_db, get_items_missing_embedding
+from utils.embeddings import ITEM_EMBEDDING_MODEL
+from models.registry import warm_up
+from utils import metrics
+
+
+@st.cache_resource
+def startup():
+    """Runs once per process, not on every rerun."""
+    init_db()
+    # Optional: WARMUP_MODELS=blip,rembg,clip preloads models in the background
+    models = [m.strip() for m in os.getenv("WARMUP_MODELS", "").split(",") if m.strip()]
+    if models:
+        warm_up(models)
+    # Keep the recommendation index in step with items saved here (SEARCH_SYNC=0 to disable)
+    if os.getenv("SEARCH_SYNC", "1") != "0":
+        from utils import search_sync
+        search_sync.start()
+    # Photos without an image embedding from this backend get one in the background (BACKFILL_EMBEDDINGS=0 to skip);
+    # photos that failed to load are left alone until their retry time
+    if os.getenv("BACKFILL_EMBEDDINGS", "1") != "0" and \
+            get_items_missing_embedding("image", limit=1, model=ITEM_EMBEDDING_MODEL):
+        from agents.wardrobe_agent import backfill_item_embeddings
+        threading.Thread(target=backfill_item_embeddings, name="embedding-backfill", daemon=True).start()
+    # Prometheus text on :METRICS_PORT/metrics, JSON on /metrics.json
+    if os.getenv("METRICS_PORT"):
+        metrics.serve(int(os.getenv("METRICS_PORT")))
+
+
+startup()
 
 # 3️⃣ Initialize session state
 if "user_id" not in st.session_state:
@@ -33,14 +65,19 @@ nav = st.sidebar.radio(
 )
 st.session_state.page = nav
 
-# 6️⃣ Render the selected view
-if nav == "My Closet":
-    my_closet.render()
-elif nav == "Add New Clothe":
-    add_clothe.render()
-elif nav == "Choose Outfit":
-    # lazy-import if outfit_chooser is heavy
-    from views import outfit_chooser
-    outfit_chooser.render()
-elif nav == "Recommendation":
-    recommendation.render()
+# 6️⃣ Render the selected view; calls made while rendering are attributed to that page in the metrics
+with metrics.flow(nav):
+    if nav == "My Closet":
+        my_closet.render()
+    elif nav == "Add New Clothe":
+        # lazy-import: pulls in rembg, OCR and the Vision client
+        from views import add_clothe
+        add_clothe.render()
+    elif nav == "Choose Outfit":
+        # lazy-import if outfit_chooser is heavy
+        from views import outfit_chooser
+        outfit_chooser.render()
+    elif nav == "Recommendation":
+        # lazy-import: pulls in CLIP and the search clients
+        from views import recommendation
+        recommendation.render()
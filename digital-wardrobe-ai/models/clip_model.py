@@ -1,11 +1,81 @@
-from transformers import CLIPProcessor, CLIPModel
+import numpy as np
 import torch
+import os
+from models.registry import CLIP_MODEL_NAME, get_model
+from utils.embeddings import get_embedding_cache
+from utils.metrics import instrument
+
+# CLIP ViT-B/32 projection size
+EMBEDDING_DIM = 512
+
+
+def set_num_threads(num_threads: int):
+    """Set the number of CPU threads torch uses for CLIP inference."""
+    torch.set_num_threads(num_threads)
+
+
+if os.getenv("CLIP_NUM_THREADS"):
+    set_num_threads(int(os.getenv("CLIP_NUM_THREADS")))
+
+
+def _embed_texts(texts: list[str], batch_size: int) -> np.ndarray:
+    embeddings = np.empty((len(texts), EMBEDDING_DIM), dtype=np.float32)
+    if not texts:
+        return embeddings
+    clip_model, clip_processor = get_model("clip")
+    # Batch texts of similar length together so little compute goes to padding
+    order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+
+    with torch.inference_mode():
+        for start in range(0, len(order), batch_size):
+            batch = order[start:start + batch_size]
+            inputs = clip_processor(
+                text=[texts[i] for i in batch], return_tensors="pt", padding=True, truncation=True
+            )
+            embeddings[batch] = clip_model.get_text_features(**inputs).numpy()
+    return embeddings
+
+
+def generate_clip_embeddings(texts: list[str], batch_size: int = 64, use_cache: bool = True) -> np.ndarray:
+    """
+    Embed many texts in padded batches. Returns a contiguous float32 matrix
+    of shape (len(texts), 512), row i being the embedding of texts[i].
+    Texts already in the embedding cache skip the model entirely.
+    """
+    with instrument("clip.text_embeddings") as span:
+        if not use_cache or not texts:
+            return _embed_texts(texts, batch_size)
+
+        cache = get_embedding_cache(CLIP_MODEL_NAME)
+        cached = cache.get_many(texts)
+        missing = list(dict.fromkeys(text for text, vector in zip(texts, cached) if vector is None))
+        span.set(cache_hits=len(texts) - sum(vector is None for vector in cached), cache_misses=len(missing))
+        if missing:
+            computed = _embed_texts(missing, batch_size)
+            cache.put_many(missing, computed)
+            by_text = dict(zip(missing, computed))
+            cached = [by_text[text] if vector is None else vector for text, vector in zip(texts, cached)]
+        return np.ascontiguousarray(np.stack(cached), dtype=np.float32)
+
+
+@instrument("clip.image_embeddings")
+def generate_clip_image_embeddings(images: list, batch_size: int = 32) -> np.ndarray:
+    """
+    Embed PIL images in batches with the CLIP vision tower. Returns a
+    contiguous float32 matrix of shape (len(images), 512).
+    """
+    embeddings = np.empty((len(images), EMBEDDING_DIM), dtype=np.float32)
+    if not images:
+        return embeddings
+    clip_model, clip_processor = get_model("clip")
+
+    with torch.inference_mode():
+        for start in range(0, len(images), batch_size):
+            batch = [image.convert("RGB") for image in images[start:start + batch_size]]
+            inputs = clip_processor(images=batch, return_tensors="pt")
+            embeddings[start:start + len(batch)] = clip_model.get_image_features(**inputs).numpy()
+    return embeddings
 
-clip_model = CLIPModel.from_pretrained("openai/clip-vit-base-patch32")
-clip_processor = CLIPProcessor.from_pretrained("openai/clip-vit-base-patch32")
 
 def generate_clip_embedding(text: str):
-    inputs = clip_processor(text=[text], return_tensors="pt", padding=True, truncation=True)
-    with torch.no_grad():
-        embedding = clip_model.get_text_features(**inputs)
-    return embedding.squeeze().tolist()
\ No newline at end of file
+    return generate_clip_embeddings([text])[0].tolist()
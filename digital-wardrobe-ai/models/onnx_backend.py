@@ -0,0 +1,387 @@
+"""
+ONNX Runtime backend for CLIP and BLIP on CPU-only nodes.
+
+    WARDROBE_INFERENCE_BACKEND=torch      eager PyTorch fp32 (default)
+    WARDROBE_INFERENCE_BACKEND=onnx       ONNX Runtime fp32
+    WARDROBE_INFERENCE_BACKEND=onnx-int8  ONNX Runtime, dynamically quantized int8 weights
+
+The registry loads the ONNX sessions in place of the PyTorch models, and the
+wrappers below mirror the few methods the call sites use (get_text_features,
+get_image_features, generate), so callers do not change. Graphs are exported
+to ONNX_MODEL_DIR on first use, or ahead of time with
+
+    python -m models.onnx_backend export [--quantize]
+    python -m models.onnx_backend parity [--image photo.jpg]
+
+`parity` compares every ONNX graph against the PyTorch model it came from.
+Importing this module does not load torch; only exporting, the parity check
+and handing results back to the (torch-based) call sites do.
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+
+INFERENCE_BACKEND = os.getenv("WARDROBE_INFERENCE_BACKEND", "torch")
+BACKENDS = ("torch", "onnx", "onnx-int8")
+ONNX_MODEL_DIR = os.getenv("ONNX_MODEL_DIR", "data/onnx")
+OPSET = 17
+
+if INFERENCE_BACKEND not in BACKENDS:
+    raise ValueError(f"WARDROBE_INFERENCE_BACKEND must be one of {', '.join(BACKENDS)}, got '{INFERENCE_BACKEND}'")
+
+GRAPHS = ("clip_text", "clip_image", "blip_vision", "blip_decoder")
+# Ops whose weights get int8. Conv stays fp32: ConvInteger with int8 weights has
+# no CPU kernel, so quantized patch embeddings would keep the vision graphs from loading.
+QUANTIZED_OP_TYPES = ["MatMul", "Gather"]
+
+
+def graph_path(name: str, quantized: bool = False) -> str:
+    return os.path.join(ONNX_MODEL_DIR, f"{name}.int8.onnx" if quantized else f"{name}.onnx")
+
+
+# ----- Export -----
+
+def _export_modules():
+    """The nn.Module wrappers that are traced, built here so torch loads only for export."""
+    import torch
+
+    class ClipText(torch.nn.Module):
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+
+        def forward(self, input_ids, attention_mask):
+            return self.model.get_text_features(input_ids=input_ids, attention_mask=attention_mask)
+
+    class ClipImage(torch.nn.Module):
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+
+        def forward(self, pixel_values):
+            return self.model.get_image_features(pixel_values=pixel_values)
+
+    class BlipVision(torch.nn.Module):
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+
+        def forward(self, pixel_values):
+            return self.model.vision_model(pixel_values=pixel_values)[0]
+
+    class BlipDecoderStep(torch.nn.Module):
+        """
+        One greedy decoding step: next-token logits for the last position.
+        Exported without past key/values, so each step re-runs the whole
+        prefix (quadratic in caption length, bounded by max_new_tokens).
+        """
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+
+        def forward(self, input_ids, attention_mask, encoder_hidden_states):
+            out = self.model.text_decoder(
+                input_ids=input_ids,
+                attention_mask=attention_mask,
+                encoder_hidden_states=encoder_hidden_states,
+                use_cache=False,
+                return_dict=True,
+            )
+            return out.logits[:, -1, :]
+
+    return ClipText, ClipImage, BlipVision, BlipDecoderStep
+
+
+def _export(module, args: tuple, path: str, input_names: list, output_names: list, dynamic_axes: dict):
+    import torch
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with torch.no_grad():
+        torch.onnx.export(
+            module.eval(), args, path,
+            input_names=input_names, output_names=output_names,
+            dynamic_axes=dynamic_axes, opset_version=OPSET, do_constant_folding=True,
+        )
+    print(f"✅ Exported {path}")
+
+
+def export_clip():
+    import torch
+    from transformers import CLIPModel
+    from models.registry import CLIP_MODEL_NAME
+    ClipText, ClipImage, _, _ = _export_modules()
+    model = CLIPModel.from_pretrained(CLIP_MODEL_NAME).eval()
+    size = model.config.vision_config.image_size
+
+    ids = torch.ones((2, 8), dtype=torch.long)
+    _export(
+        ClipText(model), (ids, torch.ones_like(ids)), graph_path("clip_text"),
+        ["input_ids", "attention_mask"], ["text_embeds"],
+        {"input_ids": {0: "batch", 1: "sequence"}, "attention_mask": {0: "batch", 1: "sequence"},
+         "text_embeds": {0: "batch"}},
+    )
+    _export(
+        ClipImage(model), (torch.zeros((2, 3, size, size)),), graph_path("clip_image"),
+        ["pixel_values"], ["image_embeds"],
+        {"pixel_values": {0: "batch"}, "image_embeds": {0: "batch"}},
+    )
+
+
+def export_blip():
+    import torch
+    from transformers import BlipForConditionalGeneration
+    from models.registry import BLIP_MODEL_NAME
+    _, _, BlipVision, BlipDecoderStep = _export_modules()
+    model = BlipForConditionalGeneration.from_pretrained(BLIP_MODEL_NAME).eval()
+    size = model.config.vision_config.image_size
+
+    with torch.no_grad():
+        image_embeds = model.vision_model(pixel_values=torch.zeros((1, 3, size, size)))[0]
+    _export(
+        BlipVision(model), (torch.zeros((1, 3, size, size)),), graph_path("blip_vision"),
+        ["pixel_values"], ["image_embeds"],
+        {"pixel_values": {0: "batch"}, "image_embeds": {0: "batch"}},
+    )
+    ids = torch.ones((1, 4), dtype=torch.long)
+    _export(
+        BlipDecoderStep(model), (ids, torch.ones_like(ids), image_embeds), graph_path("blip_decoder"),
+        ["input_ids", "attention_mask", "encoder_hidden_states"], ["logits"],
+        {"input_ids": {0: "batch", 1: "sequence"}, "attention_mask": {0: "batch", 1: "sequence"},
+         "encoder_hidden_states": {0: "batch"}, "logits": {0: "batch"}},
+    )
+
+
+def quantize(name: str) -> str:
+    """
+    Write the int8 variant of graph `name` (dynamic quantization of the
+    QUANTIZED_OP_TYPES weights) and check that ONNX Runtime can load it.
+    """
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    path = graph_path(name, quantized=True)
+    quantize_dynamic(graph_path(name), path, weight_type=QuantType.QInt8, op_types_to_quantize=QUANTIZED_OP_TYPES)
+    try:
+        _load_session(path)
+    except Exception as e:
+        os.remove(path)
+        raise RuntimeError(f"❌ Quantized graph {path} does not load in ONNX Runtime: {e}") from e
+    print(f"✅ Quantized {path}")
+    return path
+
+
+def ensure_graphs(names: list[str], quantized: bool = False):
+    """Export (and quantize) any of `names` not already on disk."""
+    missing = [name for name in names if not os.path.exists(graph_path(name))]
+    if any(name.startswith("clip") for name in missing):
+        export_clip()
+    if any(name.startswith("blip") for name in missing):
+        export_blip()
+    if quantized:
+        for name in names:
+            if not os.path.exists(graph_path(name, quantized=True)):
+                quantize(name)
+
+
+# ----- Runtime -----
+
+def _load_session(path: str):
+    import onnxruntime as ort
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    if os.getenv("CLIP_NUM_THREADS"):
+        options.intra_op_num_threads = int(os.getenv("CLIP_NUM_THREADS"))
+    return ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+
+
+def _session(name: str, quantized: bool):
+    try:
+        return _load_session(graph_path(name, quantized))
+    except Exception as e:
+        if not quantized:
+            raise
+        # int8 graphs written before Conv was left out of quantization do not load; redo them once
+        print(f"⚠️ Re-quantizing {name}: {e}")
+        return _load_session(quantize(name))
+
+
+def _numpy(value):
+    # torch tensors from the processors, without importing torch here
+    return value.numpy() if hasattr(value, "numpy") else np.asarray(value)
+
+
+def _tensor(array: np.ndarray):
+    # Call sites expect what the PyTorch models return; they already have torch loaded
+    import torch
+    return torch.from_numpy(array)
+
+
+class OnnxClip:
+    """CLIPModel stand-in exposing get_text_features / get_image_features."""
+
+    def __init__(self, quantized: bool = False):
+        ensure_graphs(["clip_text", "clip_image"], quantized)
+        self.text = _session("clip_text", quantized)
+        self.image = _session("clip_image", quantized)
+
+    def get_text_features(self, input_ids, attention_mask, **_):
+        (embeds,) = self.text.run(None, {
+            "input_ids": _numpy(input_ids).astype(np.int64),
+            "attention_mask": _numpy(attention_mask).astype(np.int64),
+        })
+        return _tensor(embeds)
+
+    def get_image_features(self, pixel_values, **_):
+        (embeds,) = self.image.run(None, {"pixel_values": _numpy(pixel_values).astype(np.float32)})
+        return _tensor(embeds)
+
+
+class OnnxBlip:
+    """BlipForConditionalGeneration stand-in for unconditional greedy captioning."""
+
+    def __init__(self, quantized: bool = False):
+        from transformers import BlipConfig
+        from models.registry import BLIP_MODEL_NAME
+        ensure_graphs(["blip_vision", "blip_decoder"], quantized)
+        self.vision = _session("blip_vision", quantized)
+        self.decoder = _session("blip_decoder", quantized)
+        text_config = BlipConfig.from_pretrained(BLIP_MODEL_NAME).text_config
+        self.bos_token_id = text_config.bos_token_id
+        self.eos_token_id = text_config.sep_token_id
+
+    def generate(self, pixel_values, max_new_tokens: int = 20, **_):
+        (image_embeds,) = self.vision.run(None, {"pixel_values": _numpy(pixel_values).astype(np.float32)})
+        batch = image_embeds.shape[0]
+        tokens = np.full((batch, 1), self.bos_token_id, dtype=np.int64)
+        finished = np.zeros(batch, dtype=bool)
+
+        for _ in range(max_new_tokens):
+            (logits,) = self.decoder.run(None, {
+                "input_ids": tokens,
+                "attention_mask": np.ones_like(tokens),
+                "encoder_hidden_states": image_embeds,
+            })
+            next_tokens = np.where(finished, self.eos_token_id, logits.argmax(axis=-1))
+            tokens = np.concatenate([tokens, next_tokens[:, None]], axis=1)
+            finished |= next_tokens == self.eos_token_id
+            if finished.all():
+                break
+        return _tensor(tokens)
+
+
+def load_clip():
+    from transformers import CLIPProcessor
+    from models.registry import CLIP_MODEL_NAME
+    return OnnxClip(INFERENCE_BACKEND == "onnx-int8"), CLIPProcessor.from_pretrained(CLIP_MODEL_NAME)
+
+
+def load_blip():
+    from transformers import BlipProcessor
+    from models.registry import BLIP_MODEL_NAME
+    return OnnxBlip(INFERENCE_BACKEND == "onnx-int8"), BlipProcessor.from_pretrained(BLIP_MODEL_NAME)
+
+
+# ----- Parity -----
+
+def _cosine_rows(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    a = a / np.linalg.norm(a, axis=1, keepdims=True)
+    b = b / np.linalg.norm(b, axis=1, keepdims=True)
+    return (a * b).sum(axis=1)
+
+
+def _timed(fn, repeats: int = 3):
+    result = fn()
+    start_time = time.time()
+    for _ in range(repeats):
+        fn()
+    return result, (time.time() - start_time) / repeats
+
+
+def parity_check(image=None, quantized: bool = False, texts: list[str] = None) -> dict:
+    """
+    Run the same inputs through PyTorch and ONNX Runtime. Reports the minimum
+    cosine similarity of CLIP embeddings, whether BLIP captions match, and the
+    mean latency of each backend.
+    """
+    import torch
+    from PIL import Image
+    from transformers import BlipForConditionalGeneration, BlipProcessor, CLIPModel, CLIPProcessor
+    from models.registry import BLIP_MODEL_NAME, CLIP_MODEL_NAME
+
+    texts = texts or ["red linen summer shirt", "black leather ankle boots", "navy wool winter coat"]
+    if image is None:
+        image = Image.fromarray(np.random.default_rng(0).integers(0, 255, (224, 224, 3), dtype=np.uint8))
+    image = image.convert("RGB")
+
+    clip_processor = CLIPProcessor.from_pretrained(CLIP_MODEL_NAME)
+    torch_clip = CLIPModel.from_pretrained(CLIP_MODEL_NAME).eval()
+    onnx_clip = OnnxClip(quantized)
+    text_inputs = clip_processor(text=texts, return_tensors="pt", padding=True)
+    image_inputs = clip_processor(images=[image], return_tensors="pt")
+
+    blip_processor = BlipProcessor.from_pretrained(BLIP_MODEL_NAME)
+    torch_blip = BlipForConditionalGeneration.from_pretrained(BLIP_MODEL_NAME).eval()
+    onnx_blip = OnnxBlip(quantized)
+    caption_inputs = blip_processor(images=image, return_tensors="pt")
+
+    report = {"backend": "onnx-int8" if quantized else "onnx"}
+    with torch.inference_mode():
+        for name, model, method, inputs in (
+            ("clip_text", (torch_clip, onnx_clip), "get_text_features", text_inputs),
+            ("clip_image", (torch_clip, onnx_clip), "get_image_features", image_inputs),
+        ):
+            expected, torch_time = _timed(lambda: getattr(model[0], method)(**inputs).numpy())
+            actual, onnx_time = _timed(lambda: getattr(model[1], method)(**inputs).numpy())
+            report[name] = {
+                "min_cosine": float(_cosine_rows(expected, actual).min()),
+                "torch_ms": torch_time * 1000,
+                "onnx_ms": onnx_time * 1000,
+            }
+
+        expected, torch_time = _timed(lambda: torch_blip.generate(**caption_inputs, max_new_tokens=20), repeats=1)
+        actual, onnx_time = _timed(lambda: onnx_blip.generate(**caption_inputs, max_new_tokens=20), repeats=1)
+    report["blip_caption"] = {
+        "torch": blip_processor.decode(expected[0], skip_special_tokens=True),
+        "onnx": blip_processor.decode(actual[0], skip_special_tokens=True),
+        "torch_ms": torch_time * 1000,
+        "onnx_ms": onnx_time * 1000,
+    }
+    report["blip_caption"]["match"] = report["blip_caption"]["torch"] == report["blip_caption"]["onnx"]
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export CLIP/BLIP to ONNX and check parity with PyTorch.")
+    parser.add_argument("command", choices=["export", "parity"])
+    parser.add_argument("--quantize", action="store_true", help="Also write / check the int8 graphs")
+    parser.add_argument("--image", help="Image to use for the parity check")
+    parser.add_argument("--min-cosine", type=float, default=None,
+                        help="Fail below this CLIP cosine (default 0.999 fp32, 0.98 int8)")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        export_clip()
+        export_blip()
+        if args.quantize:
+            for name in GRAPHS:
+                quantize(name)
+        return
+
+    from PIL import Image
+    image = Image.open(args.image) if args.image else None
+    report = parity_check(image, quantized=args.quantize)
+    threshold = args.min_cosine or (0.98 if args.quantize else 0.999)
+    ok = True
+    for name in ("clip_text", "clip_image"):
+        result = report[name]
+        passed = result["min_cosine"] >= threshold
+        ok &= passed
+        print(f"{'✅' if passed else '❌'} {name}: cosine {result['min_cosine']:.5f}, "
+              f"torch {result['torch_ms']:.1f} ms → {report['backend']} {result['onnx_ms']:.1f} ms")
+    caption = report["blip_caption"]
+    print(f"{'✅' if caption['match'] else '⚠️'} blip: '{caption['torch']}' vs '{caption['onnx']}', "
+          f"torch {caption['torch_ms']:.0f} ms → {report['backend']} {caption['onnx_ms']:.0f} ms")
+    raise SystemExit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Process-wide registry of heavy models.
+
+Nothing is loaded at import time. Each model is loaded the first time
+get_model() asks for it and is then shared by every thread and Streamlit
+session in the process. Concurrent first calls wait on a per-model lock, so
+only one copy is ever loaded. Load durations are kept for load_timings().
+CLIP and BLIP come from ONNX Runtime instead of PyTorch when
+WARDROBE_INFERENCE_BACKEND is "onnx" or "onnx-int8" (see models/onnx_backend.py).
+"""
+import threading
+import time
+
+from utils.metrics import instrument
+
+CLIP_MODEL_NAME = "openai/clip-vit-base-patch32"
+BLIP_MODEL_NAME = "Salesforce/blip-image-captioning-base"
+
+
+def _load_clip():
+    from models.onnx_backend import INFERENCE_BACKEND, load_clip
+    if INFERENCE_BACKEND != "torch":
+        return load_clip()
+    from transformers import CLIPModel, CLIPProcessor
+    return CLIPModel.from_pretrained(CLIP_MODEL_NAME).eval(), CLIPProcessor.from_pretrained(CLIP_MODEL_NAME)
+
+
+def _load_blip():
+    from models.onnx_backend import INFERENCE_BACKEND, load_blip
+    if INFERENCE_BACKEND != "torch":
+        return load_blip()
+    from transformers import BlipProcessor, BlipForConditionalGeneration
+    return BlipForConditionalGeneration.from_pretrained(BLIP_MODEL_NAME).eval(), BlipProcessor.from_pretrained(BLIP_MODEL_NAME)
+
+
+def _load_rembg():
+    from rembg import new_session
+    return new_session("u2net")
+
+
+_loaders = {
+    "clip": _load_clip,
+    "blip": _load_blip,
+    "rembg": _load_rembg,
+}
+_models = {}
+_locks = {name: threading.Lock() for name in _loaders}
+_load_times = {}
+_registry_lock = threading.Lock()
+_warmup_thread = None
+
+
+def register(name: str, loader):
+    """Register (or replace) the loader for `name`; the model is not loaded yet."""
+    with _registry_lock:
+        _loaders[name] = loader
+        _locks.setdefault(name, threading.Lock())
+        _models.pop(name, None)
+
+
+def get_model(name: str):
+    """Return the shared instance of `name`, loading it on first use."""
+    model = _models.get(name)
+    if model is not None:
+        return model
+    if name not in _loaders:
+        raise KeyError(f"Unknown model '{name}' (registered: {', '.join(_loaders)})")
+
+    with _locks[name]:
+        if name not in _models:
+            start_time = time.time()
+            with instrument(f"model.load.{name}"):
+                _models[name] = _loaders[name]()
+            _load_times[name] = time.time() - start_time
+            print(f"✅ Loaded {name} in {_load_times[name]:.2f}s")
+    return _models[name]
+
+
+def is_loaded(name: str) -> bool:
+    return name in _models
+
+
+def load_timings() -> dict:
+    """Seconds spent loading each model loaded so far."""
+    return dict(_load_times)
+
+
+def warm_up(names: list[str] = None, background: bool = True):
+    """
+    Load `names` (default: every registered model) ahead of first use. In the
+    background this runs once per process on a daemon thread, which is returned.
+    """
+    global _warmup_thread
+    names = list(names or _loaders)
+
+    def _run():
+        for name in names:
+            try:
+                get_model(name)
+            except Exception as e:
+                print(f"⚠️ Warm-up of {name} failed: {e}")
+
+    if not background:
+        _run()
+        return None
+
+    with _registry_lock:
+        if _warmup_thread is None:
+            _warmup_thread = threading.Thread(target=_run, name="model-warmup", daemon=True)
+            _warmup_thread.start()
+    return _warmup_thread
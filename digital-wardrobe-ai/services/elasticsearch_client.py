@@ -0,0 +1,134 @@
+"""
+Connection to the wardrobe's Elasticsearch cluster and its index schema.
+
+The cluster comes from ELASTICSEARCH_HOST / _USERNAME / _PASSWORD; its
+certificate is not verified. get_client() backs indexing, search sync and
+kNN queries; get_async_client() is the AsyncElasticsearch equivalent. Both
+keep ELASTICSEARCH_CONNECTIONS pooled connections per node, give up on a
+request after ELASTICSEARCH_TIMEOUT seconds, and let the transport retry
+timeouts and 429/502/503/504 up to ELASTICSEARCH_MAX_RETRIES times.
+
+INDEX_MAPPING describes the digital_wardrobe index; ensure_index() creates
+an index from it if missing, checking at most once per process.
+"""
+import os
+import threading
+
+import urllib3
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Suppress SSL warnings for self-signed certificates
+urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+ELASTICSEARCH_HOST = os.getenv("ELASTICSEARCH_HOST")
+ELASTICSEARCH_USERNAME = os.getenv("ELASTICSEARCH_USERNAME")
+ELASTICSEARCH_PASSWORD = os.getenv("ELASTICSEARCH_PASSWORD")
+REQUEST_TIMEOUT = float(os.getenv("ELASTICSEARCH_TIMEOUT", "10"))
+MAX_RETRIES = int(os.getenv("ELASTICSEARCH_MAX_RETRIES", "3"))
+CONNECTIONS_PER_NODE = int(os.getenv("ELASTICSEARCH_CONNECTIONS", "10"))
+RETRY_ON_STATUS = (429, 502, 503, 504)
+
+INDEX_NAME = "digital_wardrobe"
+INDEX_MAPPING = {
+    "mappings": {
+        "properties": {
+            "id": {"type": "keyword"},
+            "user_id": {"type": "keyword"},
+            "filename": {"type": "text"},
+            "image_url": {"type": "text"},
+            "type": {"type": "keyword"},
+            "sub_type": {"type": "keyword"},
+            "color": {"type": "keyword"},
+            "color_hex": {"type": "keyword"},
+            "material": {"type": "keyword"},
+            "pattern": {"type": "keyword"},
+            "size": {"type": "keyword"},
+            "brand": {"type": "text"},
+            "style": {"type": "keyword"},
+            "season": {"type": "keyword"},
+            "mood": {"type": "keyword"},
+            "favorite": {"type": "boolean"},
+            "date_added": {"type": "date"},
+            "last_worn": {"type": "date"},
+            "wear_count": {"type": "integer"},
+            "embedding": {
+                "type": "dense_vector",
+                "dims": 512,
+                "index": True,
+                "similarity": "cosine"
+            }
+        }
+    }
+}
+
+_lock = threading.Lock()
+_client = None
+_async_client = None
+_ready_indexes = set()
+
+
+def _client_options() -> dict:
+    if not ELASTICSEARCH_HOST:
+        raise ConnectionError("❌ ELASTICSEARCH_HOST is not set")
+    return {
+        "hosts": ELASTICSEARCH_HOST,
+        "basic_auth": (ELASTICSEARCH_USERNAME, ELASTICSEARCH_PASSWORD),
+        "verify_certs": False,
+        "request_timeout": REQUEST_TIMEOUT,
+        "max_retries": MAX_RETRIES,
+        "retry_on_timeout": True,
+        "retry_on_status": RETRY_ON_STATUS,
+        "connections_per_node": CONNECTIONS_PER_NODE,
+        "headers": {
+            "Accept": "application/vnd.elasticsearch+json; compatible-with=8",
+            "Content-Type": "application/vnd.elasticsearch+json; compatible-with=8"
+        },
+    }
+
+
+def get_client():
+    """The shared synchronous client."""
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                from elasticsearch import Elasticsearch
+                _client = Elasticsearch(**_client_options())
+    return _client
+
+
+def get_async_client():
+    """The shared AsyncElasticsearch client (needs aiohttp); use it from one event loop."""
+    global _async_client
+    if _async_client is None:
+        with _lock:
+            if _async_client is None:
+                from elasticsearch import AsyncElasticsearch
+                _async_client = AsyncElasticsearch(**_client_options())
+    return _async_client
+
+
+def ensure_index(index_name: str = INDEX_NAME, client=None):
+    """Create `index_name` with INDEX_MAPPING if it is missing; checked once per process."""
+    if index_name in _ready_indexes:
+        return
+    client = client or get_client()
+    with _lock:
+        if index_name in _ready_indexes:
+            return
+        if not client.indices.exists(index=index_name):
+            # 400 = another process created it first
+            client.options(ignore_status=400).indices.create(index=index_name, body=INDEX_MAPPING)
+            print(f"✅ Index '{index_name}' created.")
+        _ready_indexes.add(index_name)
+
+
+def close():
+    """Release the sync client's pooled node connections; the next get_client() reconnects."""
+    global _client
+    with _lock:
+        if _client is not None:
+            _client.close()
+            _client = None
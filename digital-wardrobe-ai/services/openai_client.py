@@ -0,0 +1,241 @@
+"""
+Rate-limited, retrying access to the OpenAI API.
+
+The OpenAI SDK's own retries are off; each client sits on one httpx pool of
+OPENAI_MAX_CONNECTIONS connections shared by every agent. Calls go through
+call() / acall(), which add three things:
+
+- a concurrency limit per endpoint (chat, images, audio), so a burst of
+  users queues locally instead of hammering the API;
+- retries with exponential backoff and jitter on 429, 5xx, timeouts and
+  connection errors, honouring Retry-After when the API sends it;
+- a deadline per call: retries and waiting for a slot both stop once it is
+  spent, and each attempt's HTTP timeout is capped at the time left.
+
+chat_completion(), image_generation() and transcription() (plus their
+async a* variants) wrap the endpoints the agents use. Each call is recorded
+in utils.metrics as "openai.<endpoint>", with tokens, request size and
+estimated cost.
+"""
+import asyncio
+import os
+import random
+import threading
+import time
+import weakref
+
+import httpx
+from dotenv import load_dotenv
+
+from utils.metrics import instrument, record_openai_usage
+
+load_dotenv()
+
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "4"))
+MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "20"))
+BACKOFF_BASE = 0.5      # seconds before the first retry, doubled on every further one
+BACKOFF_MAX = 20.0
+
+# Concurrent requests per endpoint, overridable with OPENAI_CONCURRENCY_<ENDPOINT>
+ENDPOINT_LIMITS = {
+    endpoint: int(os.getenv(f"OPENAI_CONCURRENCY_{endpoint.upper()}", str(default)))
+    for endpoint, default in {"chat": 8, "images": 2, "audio": 4}.items()
+}
+# Default deadline per call in seconds, overridable with OPENAI_DEADLINE_<ENDPOINT>
+ENDPOINT_DEADLINES = {
+    endpoint: float(os.getenv(f"OPENAI_DEADLINE_{endpoint.upper()}", str(default)))
+    for endpoint, default in {"chat": 60, "images": 120, "audio": 120}.items()
+}
+
+_lock = threading.Lock()
+_client = None
+_async_client = None
+_semaphores = {endpoint: threading.BoundedSemaphore(limit) for endpoint, limit in ENDPOINT_LIMITS.items()}
+# Fallback for loops that take no attributes (e.g. uvloop): {loop: {endpoint: asyncio.Semaphore}}.
+# An entry whose semaphore has made a caller wait lives on until the process ends.
+_async_semaphores = weakref.WeakKeyDictionary()
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(max_connections=MAX_CONNECTIONS, max_keepalive_connections=MAX_CONNECTIONS)
+
+
+def get_client():
+    """The shared synchronous client."""
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                from openai import OpenAI
+                # Retries are done in call(), where they can respect the deadline
+                _client = OpenAI(
+                    api_key=OPENAI_API_KEY, max_retries=0,
+                    http_client=httpx.Client(limits=_limits(), timeout=max(ENDPOINT_DEADLINES.values())),
+                )
+    return _client
+
+
+def get_async_client():
+    """The shared AsyncOpenAI client; use it from one event loop."""
+    global _async_client
+    if _async_client is None:
+        with _lock:
+            if _async_client is None:
+                from openai import AsyncOpenAI
+                _async_client = AsyncOpenAI(
+                    api_key=OPENAI_API_KEY, max_retries=0,
+                    http_client=httpx.AsyncClient(limits=_limits(), timeout=max(ENDPOINT_DEADLINES.values())),
+                )
+    return _async_client
+
+
+def _retry_delay(error, attempt: int):
+    """Seconds to wait before retrying after `error`, or None if it should not be retried."""
+    import openai
+    if isinstance(error, openai.APIStatusError):
+        if error.status_code != 429 and error.status_code < 500:
+            return None
+        retry_after = error.response.headers.get("retry-after")
+        if retry_after:
+            try:
+                return min(float(retry_after), BACKOFF_MAX)
+            except ValueError:
+                pass
+    elif not isinstance(error, (openai.APITimeoutError, openai.APIConnectionError)):
+        return None
+    return min(BACKOFF_BASE * 2 ** attempt, BACKOFF_MAX) * random.uniform(0.5, 1.0)
+
+
+def _request_bytes(kwargs: dict) -> int:
+    file = kwargs.get("file")
+    if isinstance(file, tuple):
+        file = file[1]
+    if isinstance(file, (bytes, bytearray)):
+        return len(file)
+    return len(str(kwargs.get("messages") or kwargs.get("prompt") or "").encode())
+
+
+def _record(span, endpoint: str, kwargs: dict, response):
+    span.set(bytes_in=_request_bytes(kwargs))
+    record_openai_usage(span, kwargs.get("model", ""), response,
+                        images=kwargs.get("n", 1) if endpoint == "images" else 0)
+
+
+def _deadline_exceeded(endpoint: str, deadline: float):
+    return TimeoutError(f"⏱️ OpenAI {endpoint} call exceeded its {deadline:.0f}s deadline")
+
+
+def call(endpoint: str, fn, *args, deadline: float = None, **kwargs):
+    """
+    fn(*args, **kwargs) on the shared client under `endpoint`'s concurrency
+    limit, retried on transient errors until `deadline` seconds have passed.
+    """
+    with instrument(f"openai.{endpoint}") as span:
+        response = _call(endpoint, fn, args, kwargs, deadline)
+        _record(span, endpoint, kwargs, response)
+        return response
+
+
+def _call(endpoint: str, fn, args, kwargs, deadline):
+    deadline = deadline or ENDPOINT_DEADLINES[endpoint]
+    expires = time.monotonic() + deadline
+    semaphore = _semaphores[endpoint]
+    if not semaphore.acquire(timeout=deadline):
+        raise _deadline_exceeded(endpoint, deadline)
+    try:
+        for attempt in range(MAX_RETRIES + 1):
+            try:
+                return fn(*args, timeout=max(expires - time.monotonic(), 0.1), **kwargs)
+            except Exception as e:
+                delay = _retry_delay(e, attempt)
+                if delay is None or attempt == MAX_RETRIES:
+                    raise
+                if time.monotonic() + delay >= expires:
+                    raise _deadline_exceeded(endpoint, deadline) from e
+                print(f"⚠️ OpenAI {endpoint} call failed ({e.__class__.__name__}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+    finally:
+        semaphore.release()
+
+
+def _async_semaphore(endpoint: str) -> asyncio.Semaphore:
+    # Stored on the loop itself, so both are freed together when a short-lived loop
+    # (asyncio.run) goes. A semaphore that has made a caller wait references its loop,
+    # so a table keyed by loop, even a weak one, would keep every such loop alive.
+    loop = asyncio.get_running_loop()
+    semaphores = getattr(loop, "_openai_semaphores", None)
+    if semaphores is None:
+        try:
+            semaphores = loop._openai_semaphores = {}
+        except AttributeError:
+            semaphores = _async_semaphores.setdefault(loop, {})
+    if endpoint not in semaphores:
+        semaphores[endpoint] = asyncio.Semaphore(ENDPOINT_LIMITS[endpoint])
+    return semaphores[endpoint]
+
+
+async def acall(endpoint: str, fn, *args, deadline: float = None, **kwargs):
+    """Async call(): `fn` is a coroutine function of the shared async client."""
+    with instrument(f"openai.{endpoint}") as span:
+        response = await _acall(endpoint, fn, args, kwargs, deadline)
+        _record(span, endpoint, kwargs, response)
+        return response
+
+
+async def _acall(endpoint: str, fn, args, kwargs, deadline):
+    deadline = deadline or ENDPOINT_DEADLINES[endpoint]
+    expires = time.monotonic() + deadline
+    semaphore = _async_semaphore(endpoint)
+    try:
+        await asyncio.wait_for(semaphore.acquire(), timeout=deadline)
+    except asyncio.TimeoutError:
+        raise _deadline_exceeded(endpoint, deadline) from None
+    try:
+        for attempt in range(MAX_RETRIES + 1):
+            try:
+                return await fn(*args, timeout=max(expires - time.monotonic(), 0.1), **kwargs)
+            except Exception as e:
+                delay = _retry_delay(e, attempt)
+                if delay is None or attempt == MAX_RETRIES:
+                    raise
+                if time.monotonic() + delay >= expires:
+                    raise _deadline_exceeded(endpoint, deadline) from e
+                print(f"⚠️ OpenAI {endpoint} call failed ({e.__class__.__name__}), retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+    finally:
+        semaphore.release()
+
+
+def chat_completion(deadline: float = None, **kwargs):
+    return call("chat", get_client().chat.completions.create, deadline=deadline, **kwargs)
+
+
+def image_generation(deadline: float = None, **kwargs):
+    return call("images", get_client().images.generate, deadline=deadline, **kwargs)
+
+
+def transcription(deadline: float = None, **kwargs):
+    """`file` should be bytes or a (filename, bytes) tuple so a retry can resend it."""
+    return call("audio", get_client().audio.transcriptions.create, deadline=deadline, **kwargs)
+
+
+async def achat_completion(deadline: float = None, **kwargs):
+    return await acall("chat", get_async_client().chat.completions.create, deadline=deadline, **kwargs)
+
+
+async def aimage_generation(deadline: float = None, **kwargs):
+    return await acall("images", get_async_client().images.generate, deadline=deadline, **kwargs)
+
+
+async def atranscription(deadline: float = None, **kwargs):
+    return await acall("audio", get_async_client().audio.transcriptions.create, deadline=deadline, **kwargs)
+
+
+def close():
+    """Shut down the httpx pool under the sync OpenAI client, e.g. at process exit."""
+    global _client
+    with _lock:
+        if _client is not None:
+            _client.close()
+            _client = None
@@ -4,6 +4,7 @@ import os
 import io
 import requests
 from bs4 import BeautifulSoup
+from utils.metrics import instrument
 
 load_dotenv()
 os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = os.getenv("GOOGLE_APPLICATION_CREDENTIALS")
@@ -25,7 +26,9 @@ def web_detection(image_path: str) -> list[dict]:
     with io.open(image_path, 'rb') as f:
         content = f.read()
     image = vision.Image(content=content)
-    response = client.web_detection(image=image)
+    with instrument("vision.web_detection") as span:
+        response = client.web_detection(image=image)
+        span.set(bytes_in=len(content))
     web = response.web_detection
 
     if web.full_matching_images:
@@ -49,14 +52,16 @@ def extract_vision_metadata(image_path: str) -> dict:
         content = f.read()
     image = vision.Image(content=content)
 
-    response = client.annotate_image({
-        'image': image,
-        'features': [
-            {'type': vision.Feature.Type.LABEL_DETECTION},
-            {'type': vision.Feature.Type.LOGO_DETECTION},
-            {'type': vision.Feature.Type.TEXT_DETECTION}
-        ]
-    })
+    with instrument("vision.annotate") as span:
+        response = client.annotate_image({
+            'image': image,
+            'features': [
+                {'type': vision.Feature.Type.LABEL_DETECTION},
+                {'type': vision.Feature.Type.LOGO_DETECTION},
+                {'type': vision.Feature.Type.TEXT_DETECTION}
+            ]
+        })
+        span.set(bytes_in=len(content))
 
     labels = [label.description.lower() for label in response.label_annotations]
     logos = [logo.description for logo in response.logo_annotations]
@@ -0,0 +1,33 @@
+import pytest
+
+Image = pytest.importorskip("PIL.Image")
+pytest.importorskip("rembg")
+pytest.importorskip("pytesseract")
+
+from agents import wardrobe_agent
+from utils import db
+
+
+@pytest.fixture
+def wardrobe_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(db, "DB_PATH", str(tmp_path / "wardrobe.db"))
+    monkeypatch.setattr(wardrobe_agent, "WARDROBE_DIR", str(tmp_path / "user_wardrobes"))
+    # No CLIP or search sync: only the items row is under test
+    monkeypatch.setattr(wardrobe_agent, "item_embedding_rows", lambda items, images: [])
+    monkeypatch.setattr(wardrobe_agent.search_sync, "notify", lambda: None)
+    db.init_db()
+    yield
+    db.close_connection()
+
+
+def test_save_item_stores_image_url(wardrobe_db):
+    url = "https://example.com/shirt.jpg"
+    item = wardrobe_agent.save_item_with_metadata(
+        Image.new("RGB", (8, 8)), "user-1", {"type": "shirt", "color": "blue"}, tags=["casual"], image_url=url
+    )
+
+    row = db.get_connection().execute(
+        "SELECT image_url, type FROM wardrobe_items WHERE id = ?", (item["id"],)
+    ).fetchone()
+    assert row["image_url"] == url
+    assert row["type"] == "shirt"
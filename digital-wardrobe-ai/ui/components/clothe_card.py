@@ -1,19 +1,44 @@
+import os
+
 import streamlit as st
 
+from utils.db import WARDROBE_DIR
+
+
+def _remote_url(item: dict):
+    url = item.get('image_url')
+    return url if isinstance(url, str) and url.startswith(("http://", "https://")) else None
+
+
+def _local_photo(item: dict):
+    """The item's saved photo under WARDROBE_DIR (uploaded items have no URL), if it exists."""
+    if not item.get('filename'):
+        return None
+    path = os.path.join(WARDROBE_DIR, str(item['user_id']), item['filename'])
+    return path if os.path.exists(path) else None
+
+
 def display_clothe_preview(item: dict):
     col1, col2 = st.columns([1, 3])  # Image on the left, info on the right
 
     # --- Image on the Left ---
     with col1:
-        st.markdown(
-            f"""
-            <div style="display: flex; align-items: center; height: 180px;">
-                <img src="{item['image_url']}" width="160" height="180"
-                     style="object-fit: cover; border-radius: 8px;" />
-            </div>
-            """,
-            unsafe_allow_html=True
-        )
+        url = _remote_url(item)
+        path = None if url else _local_photo(item)
+        if url:
+            st.markdown(
+                f"""
+                <div style="display: flex; align-items: center; height: 180px;">
+                    <img src="{url}" width="160" height="180"
+                         style="object-fit: cover; border-radius: 8px;" />
+                </div>
+                """,
+                unsafe_allow_html=True
+            )
+        elif path:
+            st.image(path, width=160)
+        else:
+            st.markdown("🖼️ _No image_")
 
     # --- Info on the Right, vertically centered ---
     with col2:
@@ -27,3 +52,22 @@ def display_clothe_preview(item: dict):
             """,
             unsafe_allow_html=True
         )
+
+
+def display_clothe_tile(item: dict):
+    """Compact grid variant of display_clothe_preview: thumbnail plus one caption line."""
+    url = _remote_url(item)
+    path = None if url else _local_photo(item)
+    if url:
+        st.markdown(
+            f"""
+            <img src="{url}" loading="lazy"
+                 style="width: 100%; aspect-ratio: 8 / 9; object-fit: cover; border-radius: 8px;" />
+            """,
+            unsafe_allow_html=True
+        )
+    elif path:
+        st.image(path, use_container_width=True)
+    else:
+        st.markdown("🖼️ _No image_")
+    st.caption(f"**{item.get('type') or 'Item'}** — {item.get('sub_type') or ''}")
@@ -2,17 +2,16 @@ import streamlit as st
 import os, sys
 sys.path.append(os.path.abspath(os.path.join(__file__, '..', '..')))
 from agents.recommender_agent import *
+from utils.outfit_composer import outfits_from_hits
 import requests
 from PIL import Image
 import io
 
 
-es = initialize()
-index_name = "digital_wardrobe"
-create_index(es, index_name)
-
 # Image size
 TARGET_H = 300
+# Candidates fetched per category for joint outfit scoring; each step shows the top 3
+OUTFIT_CANDIDATES = 9
 
 # --- Session State Initialization ---
 def select_item(cat: str, desc: str):
@@ -21,86 +20,145 @@ def select_item(cat: str, desc: str):
     st.session_state.step += 1
 
 
+def describe(src: dict) -> str:
+    return f"{src.get('brand') or 'Unbranded'} — {src.get('color') or ''} {src.get('type') or ''}".strip()
+
+
+def select_outfit(outfit: dict):
+    """Callback when a user takes a whole composed outfit."""
+    for cat, hit in outfit.items():
+        st.session_state.selections[cat] = describe(hit["_source"])
+    st.session_state.step = len(st.session_state.analysis.requested_categories) + 1
+
+
 def fetch_and_resize(url):
-    resp = requests.get(url, stream=True)
-    img = Image.open(io.BytesIO(resp.content)).convert("RGB")
+    """The image at `url` (http or a saved local photo) scaled to TARGET_H; None if it cannot be loaded."""
+    if not url:
+        return None
+    try:
+        if url.startswith(("http://", "https://")):
+            resp = requests.get(url, stream=True, timeout=10)
+            resp.raise_for_status()
+            img = Image.open(io.BytesIO(resp.content)).convert("RGB")
+        else:
+            img = Image.open(url).convert("RGB")
+    except Exception as e:
+        print(f"⚠️ Could not load image {url}: {e}")
+        return None
     w, h = img.size
     new_w = int(w * (TARGET_H / h))
     return img.resize((new_w, TARGET_H), Image.LANCZOS)
 
-# --- Session State Initialization ---
-if "step" not in st.session_state:
-    st.session_state.step = 0
-    st.session_state.analysis = None
-    st.session_state.selections = {}       # { category: desc }
-    st.session_state.recs_by_cat = {}
-
-# --- Title & Sidebar Summary ---
-st.title("👗 AI Fashion Recommender")
-st.sidebar.header("🛍️ Your Selections")
-if st.session_state.selections:
-    for cat, desc in st.session_state.selections.items():
-        st.sidebar.markdown(f"**{cat.capitalize()}:** {desc}")
-else:
-    st.sidebar.write("_No items selected yet_")
-
-# --- Step 0: Initial Prompt Form ---
-if st.session_state.step == 0:
-    prompt = st.text_input(
-        "Describe your outfit or ask for suggestions:",
-        placeholder="e.g. a summer date night outfit",
-        key="init_prompt"
-    )
-    if st.button("Start Recommendation") and st.session_state.init_prompt:
-        st.session_state.analysis = parse_fashion_prompt(st.session_state.init_prompt)
-        st.session_state.step = 1
-
-
-# --- Steps 1…N: One Category at a Time ---
-elif 1 <= st.session_state.step <= len(st.session_state.analysis.requested_categories):
-    cat_index = st.session_state.step - 1
-    cat = st.session_state.analysis.requested_categories[cat_index]
-    st.header(f"🎯 Suggestions for **{cat.capitalize()}**")
-
-    # Fetch once per category and cache
-    if cat not in st.session_state.recs_by_cat:
-        selected_desc = ", ".join(st.session_state.selections.values()) or "nothing"
-        prompt = (
-            f"The user has selected: {selected_desc}. "
-            f"Suggest a {cat} for: {st.session_state.analysis.scenario}."
+def show_image(url):
+    thumb = fetch_and_resize(url)
+    if thumb is not None:
+        st.image(thumb)
+    else:
+        st.markdown("🖼️ _No image_")
+
+def render():
+    """Render the recommender. Search clients are shared per process, so reruns reconnect nothing."""
+    # --- Session State Initialization ---
+    if "step" not in st.session_state:
+        st.session_state.step = 0
+        st.session_state.analysis = None
+        st.session_state.selections = {}       # { category: desc }
+        st.session_state.recs_by_cat = {}
+
+    # --- Title & Sidebar Summary ---
+    st.title("👗 AI Fashion Recommender")
+    st.sidebar.header("🛍️ Your Selections")
+    if st.session_state.selections:
+        for cat, desc in st.session_state.selections.items():
+            st.sidebar.markdown(f"**{cat.capitalize()}:** {desc}")
+    else:
+        st.sidebar.write("_No items selected yet_")
+
+    # --- Step 0: Initial Prompt Form ---
+    if st.session_state.step == 0:
+        prompt = st.text_input(
+            "Describe your outfit or ask for suggestions:",
+            placeholder="e.g. a summer date night outfit",
+            key="init_prompt"
         )
-        st.session_state.recs_by_cat[cat] = search_similar_items(prompt, cat, es)
-
-    hits = st.session_state.recs_by_cat[cat]
-
-    # Display as cards in three columns
-    cols = st.columns(3)
-    for idx, hit in enumerate(hits):
-        src = hit["_source"]
-        with cols[idx]:
-            thumb = fetch_and_resize(src["image_url"])
-            st.image(thumb)   
-            st.markdown(f"**{src['brand']}** — {src['color'].capitalize()} {src['type']}")
-
-            key = f"select_{cat}_{idx}"
-            disabled = cat in st.session_state.selections
-
-            st.button(
-                "Select",
-                key=key,
-                disabled=disabled,
-                on_click=select_item,
-                args=(cat, f"{src['brand']} — {src['color']} {src['type']}")
+        if st.button("Start Recommendation") and st.session_state.init_prompt:
+            st.session_state.analysis = parse_fashion_prompt(st.session_state.init_prompt)
+            # Every category in one round trip, so later steps render from the session cache
+            st.session_state.recs_by_cat = recommend_all(
+                st.session_state.analysis, user_id=st.session_state.get("user_id"), k=OUTFIT_CANDIDATES
+            )
+            st.session_state.outfits = outfits_from_hits(st.session_state.recs_by_cat, top_n=3, unique=True)
+            st.session_state.step = 1
+
+
+    # --- Steps 1…N: One Category at a Time ---
+    elif 1 <= st.session_state.step <= len(st.session_state.analysis.requested_categories):
+        cat_index = st.session_state.step - 1
+        cat = st.session_state.analysis.requested_categories[cat_index]
+
+        # Whole outfits scored jointly, offered before picking piece by piece
+        outfits = st.session_state.get("outfits") or []
+        if st.session_state.step == 1 and len(st.session_state.analysis.requested_categories) > 1 and outfits:
+            st.header("✨ Complete Outfits")
+            for idx, (score, outfit) in enumerate(outfits):
+                cols = st.columns(len(outfit) + 1)
+                for col, (outfit_cat, hit) in zip(cols, outfit.items()):
+                    with col:
+                        show_image(hit["_source"].get("image_url"))
+                        st.caption(f"{outfit_cat.capitalize()}: {describe(hit['_source'])}")
+                with cols[-1]:
+                    st.button("Wear this", key=f"outfit_{idx}", on_click=select_outfit, args=(outfit,))
+            st.markdown("---")
+
+        st.header(f"🎯 Suggestions for **{cat.capitalize()}**")
+
+        # Normally prefetched by recommend_all; fetch once per category otherwise
+        if cat not in st.session_state.recs_by_cat:
+            selected_desc = ", ".join(st.session_state.selections.values()) or "nothing"
+            prompt = (
+                f"The user has selected: {selected_desc}. "
+                f"Suggest a {cat} for: {st.session_state.analysis.scenario}."
+            )
+            st.session_state.recs_by_cat[cat] = search_similar_items(
+                prompt, cat, user_id=st.session_state.get("user_id")
             )
 
-
-
-# --- Final: Show Complete Outfit ---
-else:
-    st.header("🎉 Your Final Outfit")
-    for category, desc in st.session_state.selections.items():
-        st.markdown(f"- **{category.capitalize()}:** {desc}")
-    if st.button("🔄 Start Over"):
-        for k in ("step", "analysis", "selections", "recs_by_cat", "init_prompt"):
-            if k in st.session_state:
-                del st.session_state[k]
\ No newline at end of file
+        hits = st.session_state.recs_by_cat[cat][:3]
+
+        # Display as cards in three columns
+        cols = st.columns(3)
+        for idx, hit in enumerate(hits):
+            src = hit["_source"]
+            with cols[idx]:
+                show_image(src.get("image_url"))
+                st.markdown(
+                    f"**{src.get('brand') or 'Unbranded'}** — "
+                    f"{(src.get('color') or '').capitalize()} {src.get('type') or ''}"
+                )
+
+                key = f"select_{cat}_{idx}"
+                disabled = cat in st.session_state.selections
+
+                st.button(
+                    "Select",
+                    key=key,
+                    disabled=disabled,
+                    on_click=select_item,
+                    args=(cat, describe(src))
+                )
+
+
+
+    # --- Final: Show Complete Outfit ---
+    else:
+        st.header("🎉 Your Final Outfit")
+        for category, desc in st.session_state.selections.items():
+            st.markdown(f"- **{category.capitalize()}:** {desc}")
+        if st.button("🔄 Start Over"):
+            for k in ("step", "analysis", "selections", "recs_by_cat", "outfits", "init_prompt"):
+                if k in st.session_state:
+                    del st.session_state[k]
+
+
+if __name__ == "__main__":
+    render()
@@ -1,10 +1,11 @@
-import time
 import requests
 from apify_client import ApifyClient
 from typing import List
 from pydantic import BaseModel, Field
+from utils.metrics import instrument
 
 
+@instrument("apify.asos_search")
 def get_asos_clothes_search(query: str, max_items: int = 10) -> list:
     """
     Search for clothes on ASOS using the Apify ASOS Scraper actor.
@@ -56,7 +57,6 @@ class SerpiClothesSearchResponse(BaseModel):
 def get_serpi_clothes_search(query: str, limit: int=5) -> SerpiClothesSearchResponse:
     print(f"Tool called with: {query}")
     print(f"Limit = {limit}")
-    start_time= time.time()
 
     params = {
         "engine": "google_shopping",
@@ -65,7 +65,9 @@ def get_serpi_clothes_search(query: str, limit: int=5) -> SerpiClothesSearchResp
         "num": limit 
     }
 
-    response = requests.get("https://serpapi.com/search", params=params)
+    with instrument("serpapi.search") as span:
+        response = requests.get("https://serpapi.com/search", params=params)
+        span.set(bytes_out=len(response.content))
     data = response.json()
     results = data.get('shopping_results', [])
     
@@ -82,7 +84,6 @@ def get_serpi_clothes_search(query: str, limit: int=5) -> SerpiClothesSearchResp
         if i>5: 
             break
     # print(cleaned_results)
-    print(f"Time taken {time.time()-start_time}")
     return SerpiClothesSearchResponse(results=cleaned_results)
 
 # Example usage:
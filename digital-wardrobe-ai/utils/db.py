@@ -1,53 +1,474 @@
 
 import sqlite3
 import os
+import datetime
+import re
+import threading
+import weakref
+from contextlib import contextmanager
+from itertools import islice
 
 DB_PATH = 'data/wardrobe.db'
+# Saved item photos, one folder per user
+WARDROBE_DIR = 'data/user_wardrobes'
 
-def init_db():
-    # Ensure data directory exists
-    os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    # Users table
-    c.execute("""
-        CREATE TABLE IF NOT EXISTS users (
-            id TEXT PRIMARY KEY,
-            username TEXT UNIQUE NOT NULL,
-            email TEXT UNIQUE NOT NULL,
-            password_hash TEXT NOT NULL,
-            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+# Applied once to every new connection. WAL lets readers run alongside a
+# writer, so concurrent Streamlit sessions no longer hit "database is locked".
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA cache_size=-16000",      # ~16 MB page cache per connection
+    "PRAGMA mmap_size=268435456",    # 256 MB memory-mapped I/O
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA busy_timeout=5000",
+)
+
+# Columns the My Closet sidebar can filter on
+FILTER_FIELDS = ("type", "sub_type", "size", "brand", "style", "material", "season", "mood", "color")
+
+# Every closet query is scoped to one user, so each index leads with user_id
+ITEM_INDEXES = {
+    "idx_items_user_type": "user_id, type, sub_type",
+    "idx_items_user_brand": "user_id, brand",
+    "idx_items_user_color": "user_id, color",
+    "idx_items_user_style": "user_id, style",
+    "idx_items_user_season": "user_id, season",
+    "idx_items_user_added": "user_id, date_added, id",   # keyset pagination
+    "idx_items_user_worn": "user_id, type, last_worn",   # rotation stats
+}
+
+# Connections kept per database for the next thread once their thread has exited
+MAX_IDLE_CONNECTIONS = 8
+
+_local = threading.local()
+_idle = {}   # db_path -> [connection]
+_idle_lock = threading.Lock()
+
+
+class _ThreadConnections:
+    """One thread's connections, by db_path."""
+
+    def __init__(self):
+        self.connections = {}
+
+
+def _release(connections: dict):
+    """Hand an exited thread's connections to the idle pool, or close them if it is full."""
+    with _idle_lock:
+        for db_path, conn in connections.items():
+            idle = _idle.setdefault(db_path, [])
+            if len(idle) < MAX_IDLE_CONNECTIONS and not conn.in_transaction:
+                idle.append(conn)
+            else:
+                conn.close()
+
+
+def _open(db_path: str) -> sqlite3.Connection:
+    directory = os.path.dirname(db_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    # Autocommit mode: writes are grouped explicitly through transaction().
+    # Only ever used by one thread at a time, but may move to a later thread via the idle pool.
+    conn = sqlite3.connect(db_path, timeout=5.0, isolation_level=None, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+
+def get_connection(db_path: str = None) -> sqlite3.Connection:
+    """
+    Return this thread's pooled connection to `db_path` (defaults to DB_PATH).
+    Connections are tuned once and belong to the thread until it exits; then
+    they go back to an idle pool, so the next thread (e.g. Streamlit's script
+    thread for the next rerun) reuses one instead of opening its own. Callers
+    must not close them.
+    """
+    db_path = db_path or DB_PATH
+    owned = getattr(_local, "owned", None)
+    if owned is None:
+        owned = _local.owned = _ThreadConnections()
+        # Runs when the thread's locals are dropped, i.e. when it exits
+        weakref.finalize(owned, _release, owned.connections)
+
+    conn = owned.connections.get(db_path)
+    if conn is None:
+        with _idle_lock:
+            idle = _idle.get(db_path)
+            conn = idle.pop() if idle else None
+        owned.connections[db_path] = conn = conn or _open(db_path)
+    return conn
+
+
+@contextmanager
+def transaction(db_path: str = None):
+    """
+    Run a block of writes as one IMMEDIATE transaction on the pooled
+    connection. Nested use joins the outer transaction.
+    """
+    conn = get_connection(db_path)
+    if conn.in_transaction:
+        yield conn
+        return
+
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    else:
+        conn.execute("COMMIT")
+
+
+def close_connection(db_path: str = None):
+    """Close this thread's pooled connection, if any."""
+    owned = getattr(_local, "owned", None)
+    conn = owned.connections.pop(db_path or DB_PATH, None) if owned else None
+    if conn is not None:
+        conn.close()
+
+
+def _facet_source(ref: str) -> str:
+    """SELECT producing one (field, value, hex) row per facet column of `ref` (NEW/OLD/a table)."""
+    return " UNION ALL ".join(
+        f"SELECT '{field}' AS field, {ref}.{field} AS value, "
+        f"{ref + '.color_hex' if field == 'color' else 'NULL'} AS hex"
+        for field in FILTER_FIELDS
+    )
+
+def _facet_add_sql(ref: str) -> str:
+    return f"""
+        INSERT INTO item_facets (user_id, field, value, count, hex)
+        SELECT {ref}.user_id, field, value, 1, hex FROM ({_facet_source(ref)})
+        WHERE value IS NOT NULL AND value != ''
+        ON CONFLICT(user_id, field, value)
+        DO UPDATE SET count = count + 1, hex = COALESCE(excluded.hex, hex);
+    """
+
+def _facet_remove_sql(ref: str) -> str:
+    pairs = ", ".join(f"('{field}', {ref}.{field})" for field in FILTER_FIELDS)
+    return f"""
+        UPDATE item_facets SET count = count - 1
+        WHERE user_id = {ref}.user_id AND (field, value) IN (VALUES {pairs});
+        DELETE FROM item_facets WHERE user_id = {ref}.user_id AND count <= 0;
+    """
+
+def _create_facet_index(conn: sqlite3.Connection):
+    """
+    Per-user facet counts behind the closet sidebar, kept current by
+    triggers so every write path (insert, update, delete) maintains them.
+    """
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'item_facets'"
+    ).fetchone()
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS item_facets (
+            user_id TEXT NOT NULL,
+            field TEXT NOT NULL,
+            value TEXT NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            hex TEXT,
+            PRIMARY KEY (user_id, field, value)
+        ) WITHOUT ROWID
+    """)
+    watched = ", ".join(("user_id", "color_hex") + FILTER_FIELDS)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS wardrobe_items_facets_ai AFTER INSERT ON wardrobe_items
+        BEGIN {_facet_add_sql("NEW")} END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS wardrobe_items_facets_ad AFTER DELETE ON wardrobe_items
+        BEGIN {_facet_remove_sql("OLD")} END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS wardrobe_items_facets_au AFTER UPDATE OF {watched} ON wardrobe_items
+        BEGIN {_facet_remove_sql("OLD")} {_facet_add_sql("NEW")} END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS item_tags_facets_ai AFTER INSERT ON item_tags
+        BEGIN
+            INSERT INTO item_facets (user_id, field, value, count)
+            SELECT w.user_id, 'tags', t.name, 1 FROM wardrobe_items AS w, tags AS t
+            WHERE w.id = NEW.item_id AND t.id = NEW.tag_id
+            ON CONFLICT(user_id, field, value) DO UPDATE SET count = count + 1;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS item_tags_facets_ad AFTER DELETE ON item_tags
+        BEGIN
+            UPDATE item_facets SET count = count - 1
+            WHERE field = 'tags'
+              AND user_id = (SELECT user_id FROM wardrobe_items WHERE id = OLD.item_id)
+              AND value = (SELECT name FROM tags WHERE id = OLD.tag_id);
+            DELETE FROM item_facets WHERE field = 'tags' AND count <= 0;
+        END
+    """)
+    if not exists:
+        rebuild_facets()
+
+def rebuild_facets():
+    """Recompute item_facets from scratch (first run on an existing database)."""
+    per_field = " UNION ALL ".join(
+        f"SELECT user_id, '{field}' AS field, {field} AS value, "
+        f"{'color_hex' if field == 'color' else 'NULL'} AS hex FROM wardrobe_items"
+        for field in FILTER_FIELDS
+    )
+    with transaction() as conn:
+        conn.execute("DELETE FROM item_facets")
+        conn.execute(f"""
+            INSERT INTO item_facets (user_id, field, value, count, hex)
+            SELECT user_id, field, value, COUNT(*), MAX(hex) FROM ({per_field})
+            WHERE value IS NOT NULL AND value != ''
+            GROUP BY user_id, field, value
+        """)
+        conn.execute("""
+            INSERT INTO item_facets (user_id, field, value, count)
+            SELECT w.user_id, 'tags', t.name, COUNT(*)
+            FROM item_tags AS it
+            JOIN wardrobe_items AS w ON w.id = it.item_id
+            JOIN tags AS t ON t.id = it.tag_id
+            GROUP BY w.user_id, t.name
+        """)
+
+def _create_tag_tables(conn: sqlite3.Connection):
+    """
+    Normalized tags: `tags` maps name -> id, `item_tags` links items to tags
+    and is indexed in both directions (item -> tags for display, tag -> items
+    for filtering). Legacy comma-separated `wardrobe_items.tags` values are
+    migrated the first time the tables are created.
+    """
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'item_tags'"
+    ).fetchone()
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS tags (
+            id INTEGER PRIMARY KEY,
+            name TEXT UNIQUE NOT NULL
         )
     """)
-    # Wardrobe items table
-    c.execute("""
-        CREATE TABLE IF NOT EXISTS wardrobe_items (
-            id TEXT PRIMARY KEY,
-            user_id TEXT NOT NULL,
-            filename TEXT NOT NULL,
-            image_url TEXT,
-            type TEXT,
-            sub_type TEXT,
-            color TEXT,
-            color_hex TEXT,
-            material TEXT,
-            pattern TEXT,
-            size TEXT,
-            brand TEXT,
-            style TEXT,
-            season TEXT,
-            mood TEXT,
-            tags TEXT,
-            favorite INTEGER DEFAULT 0,
-            date_added DATETIME DEFAULT CURRENT_TIMESTAMP,
-            last_worn DATETIME,
-            wear_count INTEGER DEFAULT 0,
-            FOREIGN KEY(user_id) REFERENCES users(id)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS item_tags (
+            item_id TEXT NOT NULL,
+            tag_id INTEGER NOT NULL,
+            PRIMARY KEY (item_id, tag_id)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_item_tags_tag ON item_tags(tag_id, item_id)")
+    # BEFORE so the item row is still there when item_tags triggers look up its user
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS wardrobe_items_tags_bd BEFORE DELETE ON wardrobe_items
+        BEGIN
+            DELETE FROM item_tags WHERE item_id = OLD.id;
+        END
+    """)
+    return not exists
+
+def _migrate_legacy_tags(conn: sqlite3.Connection):
+    rows = conn.execute(
+        "SELECT id, tags FROM wardrobe_items WHERE tags IS NOT NULL AND tags != ''"
+    ).fetchall()
+    for item_id, tags in rows:
+        attach_tags(item_id, tags.split(","))
+
+def _ensure_columns(conn: sqlite3.Connection, table: str, columns: dict):
+    """Add columns introduced after `table` was first created on this database."""
+    existing = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+    for name, definition in columns.items():
+        if name not in existing:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {definition}")
+
+# Free-text searchable columns and their bm25 weights
+SEARCH_COLUMNS = {
+    "brand": 2.0, "type": 3.0, "sub_type": 3.0, "color": 2.0, "material": 1.0,
+    "pattern": 1.0, "style": 1.5, "mood": 1.0, "tags": 1.5, "caption": 1.0,
+}
+
+def _create_search_index(conn: sqlite3.Connection):
+    """
+    FTS5 index over wardrobe_items (external content, so text is not stored
+    twice) kept in sync by triggers. user_id is indexed as well so a search
+    is narrowed to one closet inside FTS instead of after it.
+    """
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE name = 'wardrobe_items_fts'"
+    ).fetchone()
+    columns = ", ".join(("user_id",) + tuple(SEARCH_COLUMNS))
+    new_values = ", ".join(f"NEW.{column}" for column in ("rowid", "user_id") + tuple(SEARCH_COLUMNS))
+    old_values = ", ".join(f"OLD.{column}" for column in ("rowid", "user_id") + tuple(SEARCH_COLUMNS))
+
+    conn.execute(f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS wardrobe_items_fts USING fts5(
+            {columns},
+            content='wardrobe_items', content_rowid='rowid',
+            tokenize='unicode61 remove_diacritics 2', prefix='2 3'
         )
     """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS wardrobe_items_fts_ai AFTER INSERT ON wardrobe_items
+        BEGIN
+            INSERT INTO wardrobe_items_fts (rowid, {columns}) VALUES ({new_values});
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS wardrobe_items_fts_ad AFTER DELETE ON wardrobe_items
+        BEGIN
+            INSERT INTO wardrobe_items_fts (wardrobe_items_fts, rowid, {columns})
+            VALUES ('delete', {old_values});
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS wardrobe_items_fts_au AFTER UPDATE OF {columns} ON wardrobe_items
+        BEGIN
+            INSERT INTO wardrobe_items_fts (wardrobe_items_fts, rowid, {columns})
+            VALUES ('delete', {old_values});
+            INSERT INTO wardrobe_items_fts (rowid, {columns}) VALUES ({new_values});
+        END
+    """)
+    if not exists:
+        rebuild_search_index()
+
+def rebuild_search_index():
+    """Re-derive the FTS index from wardrobe_items (first run, or after a VACUUM renumbers rowids)."""
+    with transaction() as conn:
+        conn.execute("INSERT INTO wardrobe_items_fts (wardrobe_items_fts) VALUES ('rebuild')")
 
-    conn.commit()
-    conn.close()
+def _create_change_log(conn):
+    """
+    item_changes records every insert, update and delete of wardrobe_items, in
+    commit order, for consumers that mirror the table elsewhere (the search
+    index sync). Updates are logged only when they touch a content column:
+    folding wear events into WEAR_COLUMNS does not re-index the item. On first
+    creation every existing item is logged once, so the first sync covers the
+    whole table.
+    """
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'item_changes'"
+    ).fetchone()
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS item_changes (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            item_id TEXT NOT NULL,
+            op TEXT NOT NULL,
+            changed_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    content = ", ".join(column for column in ITEM_COLUMNS if column not in WEAR_COLUMNS)
+    # Older databases have an update trigger that fires on every column
+    conn.execute("DROP TRIGGER IF EXISTS wardrobe_items_changes_update")
+    for event, op, ref in (("INSERT", "upsert", "NEW"), (f"UPDATE OF {content}", "upsert", "NEW"),
+                           ("DELETE", "delete", "OLD")):
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS wardrobe_items_changes_{event.split()[0].lower()} AFTER {event} ON wardrobe_items
+            BEGIN
+                INSERT INTO item_changes (item_id, op) VALUES ({ref}.id, '{op}');
+            END
+        """)
+    if not exists:
+        conn.execute("INSERT INTO item_changes (item_id, op) SELECT id, 'upsert' FROM wardrobe_items")
+
+def init_db():
+    with transaction() as conn:
+        # Users table
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS users (
+                id TEXT PRIMARY KEY,
+                username TEXT UNIQUE NOT NULL,
+                email TEXT UNIQUE NOT NULL,
+                password_hash TEXT NOT NULL,
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        # Wardrobe items table
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS wardrobe_items (
+                id TEXT PRIMARY KEY,
+                user_id TEXT NOT NULL,
+                filename TEXT NOT NULL,
+                image_url TEXT,
+                type TEXT,
+                sub_type TEXT,
+                color TEXT,
+                color_hex TEXT,
+                material TEXT,
+                pattern TEXT,
+                size TEXT,
+                brand TEXT,
+                style TEXT,
+                season TEXT,
+                mood TEXT,
+                tags TEXT,
+                caption TEXT,
+                favorite INTEGER DEFAULT 0,
+                date_added DATETIME DEFAULT CURRENT_TIMESTAMP,
+                last_worn DATETIME,
+                wear_count INTEGER DEFAULT 0,
+                FOREIGN KEY(user_id) REFERENCES users(id)
+            )
+        """)
+        for name, columns in ITEM_INDEXES.items():
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON wardrobe_items({columns})")
+        # Older rows were stored without a date, which would break keyset paging
+        conn.execute("UPDATE wardrobe_items SET date_added = CURRENT_TIMESTAMP WHERE date_added IS NULL")
+        _ensure_columns(conn, "wardrobe_items", {"caption": "TEXT"})
+        created_tag_tables = _create_tag_tables(conn)
+        _create_facet_index(conn)
+        if created_tag_tables:
+            _migrate_legacy_tags(conn)
+        _create_search_index(conn)
+        # CLIP vectors per item and kind ("text", "image"), float32 bytes
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS item_embeddings (
+                item_id TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                user_id TEXT NOT NULL,
+                model TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                PRIMARY KEY (item_id, kind)
+            ) WITHOUT ROWID
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_item_embeddings_user ON item_embeddings(user_id, kind)")
+        conn.execute("""
+            CREATE TRIGGER IF NOT EXISTS wardrobe_items_embeddings_ad AFTER DELETE ON wardrobe_items
+            BEGIN
+                DELETE FROM item_embeddings WHERE item_id = OLD.id;
+            END
+        """)
+        # Items whose photo could not be embedded, and when to try again
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS item_embedding_failures (
+                item_id TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                attempts INTEGER NOT NULL,
+                retry_at REAL NOT NULL,
+                PRIMARY KEY (item_id, kind)
+            ) WITHOUT ROWID
+        """)
+        conn.execute("""
+            CREATE TRIGGER IF NOT EXISTS wardrobe_items_embedding_failures_ad AFTER DELETE ON wardrobe_items
+            BEGIN
+                DELETE FROM item_embedding_failures WHERE item_id = OLD.id;
+            END
+        """)
+        # Append-only wear history, folded into wardrobe_items by fold_wear_events()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS wear_events (
+                id INTEGER PRIMARY KEY,
+                item_id TEXT NOT NULL,
+                user_id TEXT NOT NULL,
+                worn_at DATETIME NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_wear_events_item ON wear_events(item_id, worn_at)")
+        # Small key/value store for watermarks of background jobs
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS db_meta (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            )
+        """)
+        _create_change_log(conn)
+    get_connection().execute("PRAGMA optimize")
 
 def insert_user(user: dict):
     import bcrypt
@@ -55,52 +476,397 @@ def insert_user(user: dict):
     raw_password = user['password']
     password_hash = bcrypt.hashpw(raw_password.encode(), bcrypt.gensalt()).decode()
 
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("""INSERT OR IGNORE INTO users (id, username, email, password_hash)
-                 VALUES (?, ?, ?, ?)""", (
-        user['id'], user['username'], user['email'], password_hash
-    ))
-    conn.commit()
-    conn.close()
+    with transaction() as conn:
+        conn.execute("""INSERT OR IGNORE INTO users (id, username, email, password_hash)
+                        VALUES (?, ?, ?, ?)""", (
+            user['id'], user['username'], user['email'], password_hash
+        ))
 
-def insert_item(item: dict):
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("""INSERT OR REPLACE INTO wardrobe_items
-                 (id, user_id, filename, image_url, type, sub_type, color, color_hex,
-                  material, pattern, size, brand, style, season, mood,
-                  favorite, date_added, last_worn, wear_count)
-                 VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-              """, (
+# An upsert rather than INSERT OR REPLACE: REPLACE deletes the old row without
+# firing delete triggers, which would leave the derived tables out of sync.
+# Columns written by insert_item / insert_items_bulk, in _item_params order
+ITEM_COLUMNS = (
+    "id", "user_id", "filename", "image_url", "type", "sub_type", "color", "color_hex",
+    "material", "pattern", "size", "brand", "style", "season", "mood", "caption",
+    "favorite", "date_added", "last_worn", "wear_count",
+)
+# Written by fold_wear_events(); changes to these alone are not logged to item_changes
+WEAR_COLUMNS = ("last_worn", "wear_count")
+
+INSERT_ITEM_SQL = f"""
+    INSERT INTO wardrobe_items ({", ".join(ITEM_COLUMNS)})
+    VALUES ({", ".join("?" * len(ITEM_COLUMNS))})
+    ON CONFLICT(id) DO UPDATE SET {", ".join(
+        f"{column} = excluded.{column}" for column in ITEM_COLUMNS[1:]
+    )}
+"""
+
+def _item_params(item: dict) -> tuple:
+    return (
         item['id'], item['user_id'], item['filename'], item.get('image_url'),
         item.get('type'), item.get('sub_type'), item.get('color'),
         item.get('color_hex'), item.get('material'), item.get('pattern'),
         item.get('size'), item.get('brand'), item.get('style'),
-        item.get('season'), item.get('mood'), item.get('favorite', 0),
-        item.get('date_added'), item.get('last_worn'), item.get('wear_count', 0)
-    ))
-    conn.commit()
-    conn.close()
+        item.get('season'), item.get('mood'), item.get('caption'), item.get('favorite') or 0,
+        item.get('date_added') or datetime.datetime.now().isoformat(),
+        item.get('last_worn'), item.get('wear_count') or 0
+    )
+
+def insert_item(item: dict):
+    with transaction() as conn:
+        conn.execute(INSERT_ITEM_SQL, _item_params(item))
+
+def insert_items_bulk(items, chunk_size: int = 1000) -> int:
+    """
+    Insert an iterable of item dicts with one executemany per chunk, each
+    chunk in its own transaction, so memory stays bounded by `chunk_size`.
+    An item's optional "tags" (list or comma-separated string) are attached
+    in the same transaction. Returns the number of items written.
+    """
+    items = iter(items)
+    total = 0
+    while True:
+        chunk = list(islice(items, chunk_size))
+        if not chunk:
+            return total
+        with transaction() as conn:
+            conn.executemany(INSERT_ITEM_SQL, [_item_params(item) for item in chunk])
+            _attach_tags_many(conn, {
+                item['id']: item['tags'].split(",") if isinstance(item['tags'], str) else item['tags']
+                for item in chunk if item.get('tags')
+            })
+        total += len(chunk)
 
 def insert_tag(name: str) -> int:
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("INSERT OR IGNORE INTO tags (name) VALUES (?)", (name,))
-    conn.commit()
-    c.execute("SELECT id FROM tags WHERE name = ?", (name,))
-    tag_id = c.fetchone()[0]
-    conn.close()
-    return tag_id
+    with transaction() as conn:
+        conn.execute("INSERT OR IGNORE INTO tags (name) VALUES (?)", (name,))
+        return conn.execute("SELECT id FROM tags WHERE name = ?", (name,)).fetchone()[0]
+
+def _attach_tags_many(conn: sqlite3.Connection, tags_by_item: dict):
+    """Batched body of attach_tags for {item_id: [tag names]}; caller owns the transaction."""
+    links = []
+    for item_id, names in tags_by_item.items():
+        names = dict.fromkeys(name.strip() for name in names if name and name.strip())
+        links.extend((item_id, name) for name in names)
+    if not links:
+        return
+
+    conn.executemany(
+        "INSERT OR IGNORE INTO tags (name) VALUES (?)",
+        [(name,) for name in {name for _, name in links}]
+    )
+    conn.executemany(
+        "INSERT OR IGNORE INTO item_tags (item_id, tag_id) SELECT ?, id FROM tags WHERE name = ?",
+        links
+    )
+    conn.executemany("""
+        UPDATE wardrobe_items SET tags = (
+            SELECT group_concat(t.name, ',') FROM item_tags AS it
+            JOIN tags AS t ON t.id = it.tag_id
+            WHERE it.item_id = ?
+        )
+        WHERE id = ?
+    """, [(item_id, item_id) for item_id in {item_id for item_id, _ in links}])
+
+def attach_tags(item_id: str, names: list[str]):
+    """
+    Attach several tags to an item in one transaction and refresh the
+    item's comma-separated `tags` display column.
+    """
+    with transaction() as conn:
+        _attach_tags_many(conn, {item_id: names})
 
 def attach_tag_to_item(item_id: str, tag_name: str):
-    tag_id = insert_tag(tag_name)
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("INSERT OR IGNORE INTO item_tags (item_id, tag_id) VALUES (?, ?)", (item_id, tag_id))
-    conn.commit()
-    conn.close()
+    attach_tags(item_id, [tag_name])
+
+def build_items_query(user_id: str, filters: dict = None, tags: list[str] = None,
+                      match_all_tags: bool = False, columns: str = "*") -> tuple[str, list]:
+    """
+    Turn the closet filters into a parameterized query.
+    `filters` maps a FILTER_FIELDS column to the accepted values (OR within a
+    field, AND across fields); `tags` keeps items carrying any of the tags, or
+    all of them with `match_all_tags`.
+    """
+    clauses = ["user_id = ?"]
+    params = [user_id]
+
+    for field, values in (filters or {}).items():
+        if field not in FILTER_FIELDS:
+            raise ValueError(f"Unknown filter field: {field}")
+        if values:
+            clauses.append(f"{field} IN ({', '.join('?' * len(values))})")
+            params.extend(values)
+
+    if tags:
+        tag_ids = f"SELECT id FROM tags WHERE name IN ({', '.join('?' * len(tags))})"
+        if match_all_tags:
+            clauses.append(
+                f"id IN (SELECT item_id FROM item_tags WHERE tag_id IN ({tag_ids}) "
+                f"GROUP BY item_id HAVING COUNT(*) = ?)"
+            )
+            params.extend(tags)
+            params.append(len(set(tags)))
+        else:
+            clauses.append(f"id IN (SELECT item_id FROM item_tags WHERE tag_id IN ({tag_ids}))")
+            params.extend(tags)
+
+    sql = f"SELECT {columns} FROM wardrobe_items WHERE {' AND '.join(clauses)}"
+    return sql, params
+
+def get_user_items(user_id: str, filters: dict = None, tags: list[str] = None,
+                   match_all_tags: bool = False) -> list[dict]:
+    sql, params = build_items_query(user_id, filters, tags, match_all_tags)
+    rows = get_connection().execute(sql, params).fetchall()
+    return [dict(row) for row in rows]
+
+def get_user_items_page(user_id: str, filters: dict = None, tags: list[str] = None,
+                        match_all_tags: bool = False, after: tuple = None,
+                        page_size: int = 24) -> tuple[list[dict], tuple]:
+    """
+    One page of matching items, newest first, using keyset pagination on
+    (date_added, id) so every page costs the same however deep it is.
+    `after` is the cursor returned with the previous page; the returned
+    cursor is None on the last page.
+    """
+    sql, params = build_items_query(user_id, filters, tags, match_all_tags)
+    if after:
+        sql += " AND (date_added, id) < (?, ?)"
+        params.extend(after)
+    sql += " ORDER BY date_added DESC, id DESC LIMIT ?"
+    params.append(page_size + 1)
+
+    items = [dict(row) for row in get_connection().execute(sql, params).fetchall()]
+    if len(items) <= page_size:
+        return items, None
+    items = items[:page_size]
+    return items, (items[-1]["date_added"], items[-1]["id"])
+
+def _fts_phrase(text: str) -> str:
+    return '"' + text.replace('"', '""') + '"'
+
+def search_items(user_id: str, text: str, filters: dict = None, tags: list[str] = None,
+                 match_all_tags: bool = False, limit: int = 50) -> list[dict]:
+    """
+    Ranked free-text search over one user's closet. Every word is matched as
+    a prefix across SEARCH_COLUMNS; the sidebar filters still apply.
+    """
+    words = re.findall(r"\w+", text.lower())
+    if not words:
+        return []
+
+    text_columns = " ".join(SEARCH_COLUMNS)
+    match = (
+        f"user_id : {_fts_phrase(user_id)} AND "
+        f"{{{text_columns}}} : ({' '.join(_fts_phrase(word) + '*' for word in words)})"
+    )
+    weights = ", ".join(str(weight) for weight in (0.0,) + tuple(SEARCH_COLUMNS.values()))
+
+    sql = f"""
+        SELECT w.*, bm25(wardrobe_items_fts, {weights}) AS rank
+        FROM wardrobe_items_fts JOIN wardrobe_items AS w ON w.rowid = wardrobe_items_fts.rowid
+        WHERE wardrobe_items_fts MATCH ? AND w.user_id = ?
+    """
+    params = [match, user_id]
+    if any((filters or {}).values()) or tags:
+        filter_sql, filter_params = build_items_query(user_id, filters, tags, match_all_tags, columns="rowid")
+        sql += f" AND w.rowid IN ({filter_sql})"
+        params.extend(filter_params)
+    sql += " ORDER BY rank LIMIT ?"
+    params.append(limit)
+
+    return [dict(row) for row in get_connection().execute(sql, params).fetchall()]
+
+def get_meta(key: str, default: str = None) -> str:
+    row = get_connection().execute("SELECT value FROM db_meta WHERE key = ?", (key,)).fetchone()
+    return row[0] if row else default
+
+def set_meta(key: str, value):
+    with transaction() as conn:
+        conn.execute(
+            "INSERT INTO db_meta (key, value) VALUES (?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (key, str(value))
+        )
+
+def append_wear_events(events: list[tuple]):
+    """Append (item_id, user_id, worn_at) rows to wear_events in one transaction."""
+    with transaction() as conn:
+        conn.executemany(
+            "INSERT INTO wear_events (item_id, user_id, worn_at) VALUES (?, ?, ?)", events
+        )
+
+def has_unfolded_wear_events() -> bool:
+    """Plain read: are there wear events past the fold watermark?"""
+    latest = get_connection().execute("SELECT MAX(id) FROM wear_events").fetchone()[0]
+    return latest is not None and latest > int(get_meta("wear_events_folded", 0))
+
+def fold_wear_events() -> int:
+    """
+    Fold wear events newer than the stored watermark into
+    wardrobe_items.wear_count / last_worn with one UPDATE per worn item.
+    Returns the number of events folded.
+    """
+    # Check on a plain read first, so idle flushes never take the write lock
+    if not has_unfolded_wear_events():
+        return 0
+    with transaction() as conn:
+        folded_up_to = int(get_meta("wear_events_folded", 0))
+        latest = conn.execute("SELECT MAX(id) FROM wear_events").fetchone()[0]
+        if latest is None or latest <= folded_up_to:
+            return 0
+
+        rows = conn.execute("""
+            SELECT item_id, COUNT(*), MAX(worn_at) FROM wear_events
+            WHERE id > ? AND id <= ?
+            GROUP BY item_id
+        """, (folded_up_to, latest)).fetchall()
+        conn.executemany("""
+            UPDATE wardrobe_items
+            SET wear_count = COALESCE(wear_count, 0) + ?,
+                last_worn = MAX(COALESCE(last_worn, ''), ?)
+            WHERE id = ?
+        """, [(count, worn_at, item_id) for item_id, count, worn_at in rows])
+        set_meta("wear_events_folded", latest)
+        return sum(count for _, count, _ in rows)
+
+def get_least_recently_worn(user_id: str, item_type: str, limit: int = 5) -> list[dict]:
+    """Items of one type, never-worn first, then oldest last_worn (index seek, no scan)."""
+    rows = get_connection().execute("""
+        SELECT * FROM wardrobe_items
+        WHERE user_id = ? AND type = ?
+        ORDER BY last_worn ASC
+        LIMIT ?
+    """, (user_id, item_type, limit)).fetchall()
+    return [dict(row) for row in rows]
+
+def get_rotation_stats(user_id: str, limit: int = 3) -> dict:
+    """{type: least recently worn items} for every clothing type the user owns."""
+    types = [value for value, _ in get_facets(user_id)["type"]]
+    return {item_type: get_least_recently_worn(user_id, item_type, limit) for item_type in types}
+
+def get_items_by_ids(item_ids: list[str]) -> dict:
+    """{item_id: item} for the given ids (missing ids are left out)."""
+    items = {}
+    conn = get_connection()
+    for start in range(0, len(item_ids), 500):
+        chunk = item_ids[start:start + 500]
+        rows = conn.execute(
+            f"SELECT * FROM wardrobe_items WHERE id IN ({', '.join('?' * len(chunk))})", chunk
+        ).fetchall()
+        items.update((row["id"], dict(row)) for row in rows)
+    return items
+
+def upsert_item_embeddings(rows: list[tuple]):
+    """Store (item_id, kind, user_id, model, vector_bytes) rows in one transaction."""
+    with transaction() as conn:
+        conn.executemany("""
+            INSERT INTO item_embeddings (item_id, kind, user_id, model, vector)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(item_id, kind) DO UPDATE SET
+                user_id = excluded.user_id, model = excluded.model, vector = excluded.vector
+        """, rows)
+        conn.executemany(
+            "DELETE FROM item_embedding_failures WHERE item_id = ? AND kind = ?",
+            [(row[0], row[1]) for row in rows]
+        )
+
+def get_item_embeddings(user_id: str, kind: str, model: str = None) -> list[tuple]:
+    """(item_id, vector_bytes) for every item of `user_id` with a `kind` embedding (from `model`, if given)."""
+    sql = "SELECT item_id, vector FROM item_embeddings WHERE user_id = ? AND kind = ?"
+    params = [user_id, kind]
+    if model:
+        sql += " AND model = ?"
+        params.append(model)
+    return [tuple(row) for row in get_connection().execute(sql, params)]
+
+def get_items_missing_embedding(kind: str, user_id: str = None, limit: int = 1000, model: str = None) -> list[dict]:
+    """
+    Items with no `kind` embedding (or none from `model`, if given), leaving
+    out those whose last failure is still waiting for its retry_at.
+    """
+    sql = f"""
+        SELECT w.* FROM wardrobe_items AS w
+        WHERE NOT EXISTS (
+            SELECT 1 FROM item_embeddings AS e
+            WHERE e.item_id = w.id AND e.kind = ?{" AND e.model = ?" if model else ""}
+        )
+        AND NOT EXISTS (
+            SELECT 1 FROM item_embedding_failures AS f
+            WHERE f.item_id = w.id AND f.kind = ? AND f.retry_at > ?
+        )
+    """
+    params = [kind] + ([model] if model else []) + [kind, datetime.datetime.now().timestamp()]
+    if user_id:
+        sql += " AND w.user_id = ?"
+        params.append(user_id)
+    sql += " LIMIT ?"
+    params.append(limit)
+    return [dict(row) for row in get_connection().execute(sql, params)]
+
+def record_embedding_failures(item_ids: list[str], kind: str, retry_after: float, max_retry_after: float):
+    """
+    Note that `item_ids` could not be embedded. The first retry waits
+    `retry_after` seconds, each further one twice as long, up to `max_retry_after`.
+    """
+    now = datetime.datetime.now().timestamp()
+    with transaction() as conn:
+        conn.executemany("""
+            INSERT INTO item_embedding_failures (item_id, kind, attempts, retry_at)
+            VALUES (?, ?, 1, ?)
+            ON CONFLICT(item_id, kind) DO UPDATE SET
+                attempts = attempts + 1,
+                retry_at = ? + MIN(? * (1 << attempts), ?)
+        """, [(item_id, kind, now + retry_after, now, retry_after, max_retry_after) for item_id in item_ids])
+
+def get_item_changes(after_seq: int = 0, limit: int = 1000) -> list[tuple]:
+    """(seq, item_id, op) change-log rows after `after_seq`, oldest first."""
+    return [tuple(row) for row in get_connection().execute(
+        "SELECT seq, item_id, op FROM item_changes WHERE seq > ? ORDER BY seq LIMIT ?",
+        (after_seq, limit)
+    )]
+
+def requeue_item_changes(item_ids: list[str]):
+    """Append an update to the change log for each of `item_ids`, so consumers process them again."""
+    with transaction() as conn:
+        conn.executemany("INSERT INTO item_changes (item_id, op) VALUES (?, 'upsert')", [(i,) for i in item_ids])
+
+def prune_item_changes(up_to_seq: int):
+    """Drop change-log rows every consumer has processed."""
+    with transaction() as conn:
+        conn.execute("DELETE FROM item_changes WHERE seq <= ?", (up_to_seq,))
+
+def get_facets(user_id: str) -> dict:
+    """
+    Sidebar facets for one user in a single indexed read: every FILTER_FIELDS
+    column maps to a sorted [(value, count)] list, plus "color_hex"
+    ({color: hex}) and "tags".
+    """
+    facets = {field: [] for field in FILTER_FIELDS + ("tags",)}
+    facets["color_hex"] = {}
+
+    rows = get_connection().execute(
+        "SELECT field, value, count, hex FROM item_facets WHERE user_id = ? ORDER BY field, value",
+        (user_id,)
+    ).fetchall()
+    for field, value, count, hex_code in rows:
+        facets[field].append((value, count))
+        if field == "color" and hex_code:
+            facets["color_hex"][value] = hex_code
+    return facets
+
+def get_username(user_id: str) -> str:
+    row = get_connection().execute(
+        "SELECT username FROM users WHERE id = ?", (user_id,)
+    ).fetchone()
+    return row[0] if row else "User"
+
+def get_password_hash(username: str):
+    """Return (user_id, password_hash) for `username`, or None."""
+    row = get_connection().execute(
+        "SELECT id, password_hash FROM users WHERE username = ?", (username,)
+    ).fetchone()
+    return tuple(row) if row else None
 
 if __name__ =="__main__":
     init_db()
-    print("Database created successfully.")
\ No newline at end of file
+    print("Database created successfully.")
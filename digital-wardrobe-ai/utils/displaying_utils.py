@@ -94,30 +94,23 @@ def display_outfit(outfit_items, categories):
 
 
 
-import random
-import streamlit as st
+from utils.outfit_composer import compose_items
 
 def generate_and_display_outfits(response, categories):
     """
     Given a response.model with `clothing_options` per category and a list of categories:
       1) Compute how many fully-unique outfits you can make
-      2) Shuffle each category’s options
-      3) Build all unique outfits
+      2) Embed every option's title in one batch
+      3) Pick the best-matching unique outfits by joint score (utils/outfit_composer)
       4) Store them in session_state and render each via display_outfit()
     """
     # 1) Figure out the maximum number of full outfits
     max_outfits = min(len(response.clothing_options[c]) for c in categories)
 
-    # 2) Shuffle each category’s list in place
-    shuffled = {c: list(response.clothing_options[c]) for c in categories}
-    for lst in shuffled.values():
-        random.shuffle(lst)
-
-    # 3) Build each outfit as a dict mapping category → item
-    unique_outfits = [
-        {c: shuffled[c][i] for c in categories}
-        for i in range(max_outfits)
-    ]
+    # 2) + 3) Score whole outfits instead of zipping shuffled lists
+    options = {c: list(response.clothing_options[c]) for c in categories}
+    outfits = compose_items(options, lambda item: item.get('title') or '', top_n=max_outfits, unique=True)
+    unique_outfits = [picked for _, picked in outfits]
 
     # 4) Persist to session_state and display them
     st.session_state['unique_outfits'] = unique_outfits
@@ -0,0 +1,195 @@
+"""
+Content-addressed cache for embeddings.
+
+Entries are keyed by sha256(model name, inference backend, normalized text),
+so the same prompt or item description is embedded once per model and
+backend no matter where it comes from; ONNX and int8 vectors never stand in
+for PyTorch ones. Lookups check an in-process LRU first, then an on-disk
+SQLite tier holding raw float32 vectors. The disk tier is trimmed to
+`max_disk_bytes`, least recently used first.
+"""
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from models.registry import CLIP_MODEL_NAME
+from utils.db import get_connection, transaction
+
+CACHE_DB_PATH = "data/embedding_cache.db"
+# Same variable models/onnx_backend.py reads; not imported from there so this module stays torch-free
+INFERENCE_BACKEND = os.getenv("WARDROBE_INFERENCE_BACKEND", "torch")
+# The model tag on item_embeddings rows, so vectors from different backends never mix
+ITEM_EMBEDDING_MODEL = f"{CLIP_MODEL_NAME}@{INFERENCE_BACKEND}"
+# Disk hits are stamped with last_used in one write per this many keys (or on the next put)
+TOUCH_BATCH = 256
+
+
+def item_embedding_text(item: dict) -> str:
+    """The templated description of an item that its text embedding is computed from."""
+    return f"{item['color']} {item['material']} {item['pattern']} {item['type']} from {item['brand']}, style: {item['style']}, season: {item['season']}, mood: {item['mood']}"
+
+
+def normalize_text(text: str) -> str:
+    # CLIP's tokenizer lowercases and splits on whitespace, so this is lossless
+    return " ".join(text.lower().split())
+
+
+class EmbeddingCache:
+    def __init__(self, model_name: str, db_path: str = CACHE_DB_PATH,
+                 memory_items: int = 4096, max_disk_bytes: int = 256 * 1024 * 1024,
+                 backend: str = INFERENCE_BACKEND):
+        self.model_name = model_name
+        self.backend = backend
+        self.db_path = db_path
+        self.memory_items = memory_items
+        self.max_disk_bytes = max_disk_bytes
+        self.hits = {"memory": 0, "disk": 0}
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._schema_ready = False
+        self._touched = {}      # key -> last_used, not yet written
+        self._disk_rows = 0     # upper bound on rows on disk; exact after each eviction check
+
+    def key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model_name}\0{self.backend}\0{normalize_text(text)}".encode()).hexdigest()
+
+    def _ensure_schema(self):
+        if self._schema_ready:
+            return
+        with transaction(self.db_path) as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS embeddings (
+                    key TEXT PRIMARY KEY,
+                    model TEXT NOT NULL,
+                    vector BLOB NOT NULL,
+                    last_used REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings(last_used)")
+            self._disk_rows = conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        self._schema_ready = True
+
+    def _remember(self, key: str, vector: np.ndarray):
+        with self._lock:
+            self._memory[key] = vector
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_items:
+                self._memory.popitem(last=False)
+
+    def get_many(self, texts: list[str]) -> list:
+        """Cached vectors for `texts`, with None where there is no entry."""
+        keys = [self.key(text) for text in texts]
+        found = {}
+        with self._lock:
+            for key in keys:
+                if key in self._memory:
+                    self._memory.move_to_end(key)
+                    found[key] = self._memory[key]
+                    self.hits["memory"] += 1
+
+        pending = list(dict.fromkeys(key for key in keys if key not in found))
+        loaded_from_disk = set()
+        if pending:
+            self._ensure_schema()
+            conn = get_connection(self.db_path)
+            rows = []
+            for start in range(0, len(pending), 500):
+                chunk = pending[start:start + 500]
+                rows += conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({', '.join('?' * len(chunk))})",
+                    chunk
+                ).fetchall()
+            for key, blob in rows:
+                vector = np.frombuffer(blob, dtype=np.float32)
+                found[key] = vector
+                loaded_from_disk.add(key)
+                self._remember(key, vector)
+            if rows:
+                now = time.time()
+                with self._lock:
+                    self._touched.update((key, now) for key, _ in rows)
+                    flush = len(self._touched) >= TOUCH_BATCH
+                if flush:
+                    with transaction(self.db_path) as conn:
+                        self._flush_touches(conn)
+
+        results = []
+        for key in keys:
+            vector = found.get(key)
+            if vector is None:
+                self.misses += 1
+            elif key in loaded_from_disk:
+                self.hits["disk"] += 1
+            results.append(vector)
+        return results
+
+    def put_many(self, texts: list[str], vectors: np.ndarray):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        keys = [self.key(text) for text in texts]
+        for key, vector in zip(keys, vectors):
+            self._remember(key, vector)
+
+        self._ensure_schema()
+        now = time.time()
+        with transaction(self.db_path) as conn:
+            self._flush_touches(conn)
+            conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, model, vector, last_used) VALUES (?, ?, ?, ?)",
+                [(key, self.model_name, vector.tobytes(), now) for key, vector in zip(keys, vectors)]
+            )
+            self._evict(conn, len(keys), vectors.shape[-1] * 4)
+
+    def _flush_touches(self, conn):
+        with self._lock:
+            touched, self._touched = self._touched, {}
+        if touched:
+            conn.executemany(
+                "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                [(last_used, key) for key, last_used in touched.items()]
+            )
+
+    def _evict(self, conn, inserted: int, vector_bytes: int):
+        # Replacements count as inserts here, so the running count only errs high. COUNT(*) runs
+        # only once it crosses the limit; trimming to 90% leaves room for many puts before the next one
+        max_rows = self.max_disk_bytes // max(vector_bytes, 1)
+        with self._lock:
+            self._disk_rows += inserted
+            if self._disk_rows <= max_rows:
+                return
+        count = conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        keep = max_rows * 9 // 10
+        if count > max_rows:
+            conn.execute(
+                "DELETE FROM embeddings WHERE key IN "
+                "(SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+                (count - keep,)
+            )
+        with self._lock:
+            self._disk_rows = count if count <= max_rows else keep
+
+    def stats(self) -> dict:
+        return {
+            "model": self.model_name,
+            "backend": self.backend,
+            "memory_hits": self.hits["memory"],
+            "disk_hits": self.hits["disk"],
+            "misses": self.misses,
+            "memory_entries": len(self._memory),
+        }
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_embedding_cache(model_name: str) -> EmbeddingCache:
+    """Process-wide cache instance for `model_name`."""
+    with _caches_lock:
+        if model_name not in _caches:
+            _caches[model_name] = EmbeddingCache(model_name)
+        return _caches[model_name]
@@ -1,8 +1,6 @@
-import time
 from dotenv import load_dotenv  # load environment variables from .env file
 load_dotenv()
-from openai import OpenAI
-client = OpenAI()
+from services.openai_client import image_generation
 
 def create_outfit(style):
     print(style)
@@ -22,14 +20,12 @@ def create_outfit(style):
     {clothes}
     *Important: Show just the human in the photo and also do not show the head
     """
-    start_time=time.time()
-    result = client.images.generate(
+    result = image_generation(
         model="dall-e-3",
         prompt=prompt,
         size="1024x1024",
         n=1,
     )
     print(result.data[0].url)
-    print(f"Time taken: {time.time()-start_time}")
 
     return result
\ No newline at end of file
@@ -0,0 +1,113 @@
+"""
+Stream a wardrobe export (CSV, Parquet or JSONL) into `wardrobe_items`.
+
+    python -m utils.import_wardrobe utils/Generated_Wardrobe_Items.csv --user-id test_user
+
+Rows are read lazily and written in chunks through `insert_items_bulk`, so
+memory stays bounded by --chunk-size regardless of the file size.
+"""
+import argparse
+import csv
+import json
+import math
+import os
+import time
+import uuid
+
+from utils import db
+
+ITEM_COLUMNS = db.ITEM_COLUMNS + ("tags",)
+
+
+def read_csv(path: str):
+    with open(path, newline="", encoding="utf-8") as f:
+        yield from csv.DictReader(f)
+
+
+def read_jsonl(path: str):
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def read_parquet(path: str, batch_size: int = 10_000):
+    try:
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise RuntimeError("Parquet import requires pyarrow (pip install pyarrow)") from e
+
+    parquet_file = pq.ParquetFile(path)
+    columns = [c for c in ITEM_COLUMNS if c in parquet_file.schema_arrow.names]
+    for batch in parquet_file.iter_batches(batch_size=batch_size, columns=columns):
+        yield from batch.to_pylist()
+
+
+READERS = {
+    ".csv": read_csv,
+    ".jsonl": read_jsonl,
+    ".ndjson": read_jsonl,
+    ".parquet": read_parquet,
+}
+
+
+def _clean(value):
+    if value is None:
+        return None
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    if isinstance(value, str):
+        value = value.strip()
+        return value or None
+    return value
+
+
+def _as_flag(value) -> int:
+    if isinstance(value, str):
+        return 1 if value.strip().lower() in ("1", "true", "yes", "y") else 0
+    return 1 if value else 0
+
+
+def normalize_row(row: dict, user_id: str = None) -> dict:
+    """Map one exported row onto the wardrobe_items columns."""
+    item = {column: _clean(row.get(column)) for column in ITEM_COLUMNS}
+    item["id"] = str(item["id"] or uuid.uuid4())
+    item["user_id"] = user_id or item["user_id"]
+    if not item["user_id"]:
+        raise ValueError(f"Row {item['id']} has no user_id; pass --user-id")
+    item["filename"] = item["filename"] or f"{item['type'] or 'item'}_{item['id'][:8]}.jpg"
+    item["favorite"] = _as_flag(item["favorite"])
+    item["wear_count"] = int(float(item["wear_count"] or 0))
+    if isinstance(item["tags"], str):
+        item["tags"] = item["tags"].split(",")
+    return item
+
+
+def import_file(path: str, user_id: str = None, chunk_size: int = 1000) -> int:
+    extension = os.path.splitext(path)[1].lower()
+    reader = READERS.get(extension)
+    if reader is None:
+        raise ValueError(f"Unsupported file type '{extension}' (expected {', '.join(READERS)})")
+
+    db.init_db()
+    rows = (normalize_row(row, user_id) for row in reader(path))
+    return db.insert_items_bulk(rows, chunk_size=chunk_size)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import wardrobe items into SQLite.")
+    parser.add_argument("path", help="CSV, Parquet or JSONL export")
+    parser.add_argument("--user-id", help="Assign every imported item to this user")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="Rows per transaction")
+    parser.add_argument("--db", default=db.DB_PATH, help="SQLite database path")
+    args = parser.parse_args()
+
+    db.DB_PATH = args.db
+    start_time = time.time()
+    count = import_file(args.path, user_id=args.user_id, chunk_size=args.chunk_size)
+    elapsed = time.time() - start_time
+    print(f"✅ Imported {count} items in {elapsed:.2f}s ({count / max(elapsed, 1e-9):.0f} items/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+"""
+In-process metrics for model and API calls.
+
+Wrap a call with `instrument(name)`, either as a decorator or as a context
+manager:
+
+    @instrument("vision.annotate")
+    def extract_vision_metadata(...): ...
+
+    with instrument("serpapi.search") as span:
+        response = requests.get(...)
+        span.set(bytes_out=len(response.content))
+
+Each call records its wall time and whether it failed. A span can also carry
+token counts, payload sizes, a cache hit or miss, and a cost in USD. Calls
+are aggregated per (flow, name), where the flow is whatever `flow(...)` block
+is active, e.g. the page being rendered. That shows which stage dominates
+each user flow.
+
+snapshot() / to_json() / to_prometheus() export the registry; serve() exposes
+the Prometheus text on METRICS_PORT.
+"""
+import asyncio
+import contextvars
+import functools
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+# Upper bounds (seconds) of the latency histogram buckets
+BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# USD per 1K tokens (prompt, completion) and per image, as published by OpenAI
+TOKEN_PRICES = {
+    "gpt-4": (0.03, 0.06),
+    "gpt-4-turbo": (0.01, 0.03),
+    "gpt-4o": (0.0025, 0.01),
+    "gpt-4.1": (0.002, 0.008),
+    "gpt-4o-transcribe": (0.0025, 0.01),
+}
+IMAGE_PRICES = {"dall-e-3": 0.04, "dall-e-2": 0.02}
+
+_current_flow = contextvars.ContextVar("metrics_flow", default="-")
+
+
+def cost_usd(model: str, prompt_tokens: int = 0, completion_tokens: int = 0, images: int = 0) -> float:
+    """Estimated cost of one call; 0.0 for models not in the price tables."""
+    prompt_price, completion_price = TOKEN_PRICES.get(model, (0.0, 0.0))
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1000 \
+        + images * IMAGE_PRICES.get(model, 0.0)
+
+
+class _Stats:
+    __slots__ = ("calls", "errors", "seconds", "max_seconds", "buckets", "prompt_tokens",
+                 "completion_tokens", "bytes_in", "bytes_out", "cache_hits", "cache_misses", "cost_usd")
+
+    def __init__(self):
+        self.calls = self.errors = 0
+        self.seconds = self.max_seconds = 0.0
+        self.buckets = [0] * len(BUCKETS)
+        self.prompt_tokens = self.completion_tokens = 0
+        self.bytes_in = self.bytes_out = 0
+        self.cache_hits = self.cache_misses = 0
+        self.cost_usd = 0.0
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._stats = {}   # (flow, name) -> _Stats
+        self._lock = threading.Lock()
+
+    def record(self, name: str, seconds: float, error: bool = False, flow: str = None,
+               prompt_tokens: int = 0, completion_tokens: int = 0, bytes_in: int = 0, bytes_out: int = 0,
+               cache_hits: int = 0, cache_misses: int = 0, cost_usd: float = 0.0):
+        key = (flow or _current_flow.get(), name)
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = _Stats()
+            stats.calls += 1
+            stats.errors += bool(error)
+            stats.seconds += seconds
+            stats.max_seconds = max(stats.max_seconds, seconds)
+            for i, bound in enumerate(BUCKETS):
+                if seconds <= bound:
+                    stats.buckets[i] += 1
+                    break
+            stats.prompt_tokens += prompt_tokens
+            stats.completion_tokens += completion_tokens
+            stats.bytes_in += bytes_in
+            stats.bytes_out += bytes_out
+            stats.cache_hits += cache_hits
+            stats.cache_misses += cache_misses
+            stats.cost_usd += cost_usd
+
+    def snapshot(self) -> dict:
+        """{flow: {name: stats}}, with each flow's calls sorted by total time, slowest first."""
+        with self._lock:
+            items = [(flow, name, stats, list(stats.buckets)) for (flow, name), stats in self._stats.items()]
+        flows = {}
+        for flow, name, stats, buckets in sorted(items, key=lambda item: -item[2].seconds):
+            entry = {slot: getattr(stats, slot) for slot in _Stats.__slots__ if slot != "buckets"}
+            entry["mean_seconds"] = stats.seconds / stats.calls if stats.calls else 0.0
+            entry["buckets"] = dict(zip(map(str, BUCKETS), buckets))
+            flows.setdefault(flow, {})[name] = entry
+        return flows
+
+    def to_json(self, indent: int = 2) -> str:
+        return json.dumps(self.snapshot(), indent=indent)
+
+    def to_prometheus(self, prefix: str = "wardrobe_call") -> str:
+        """Prometheus text exposition format."""
+        lines = []
+        counters = [
+            ("errors", "errors_total", "counter", "Failed calls"),
+            ("prompt_tokens", "prompt_tokens_total", "counter", "Prompt tokens sent"),
+            ("completion_tokens", "completion_tokens_total", "counter", "Completion tokens received"),
+            ("bytes_in", "request_bytes_total", "counter", "Request payload bytes"),
+            ("bytes_out", "response_bytes_total", "counter", "Response payload bytes"),
+            ("cache_hits", "cache_hits_total", "counter", "Cache hits"),
+            ("cache_misses", "cache_misses_total", "counter", "Cache misses"),
+            ("cost_usd", "cost_usd_total", "counter", "Estimated cost in USD"),
+        ]
+        snapshot = self.snapshot()
+        rows = [(flow, name, entry) for flow, calls in snapshot.items() for name, entry in calls.items()]
+
+        lines += [f"# HELP {prefix}_seconds Wall time per call", f"# TYPE {prefix}_seconds histogram"]
+        for flow, name, entry in rows:
+            labels = f'call="{name}",flow="{flow}"'
+            cumulative = 0
+            for bound, count in entry["buckets"].items():
+                cumulative += count
+                lines.append(f'{prefix}_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'{prefix}_seconds_bucket{{{labels},le="+Inf"}} {entry["calls"]}')
+            lines.append(f"{prefix}_seconds_sum{{{labels}}} {entry['seconds']}")
+            lines.append(f"{prefix}_seconds_count{{{labels}}} {entry['calls']}")
+        for field, metric, kind, help_text in counters:
+            lines += [f"# HELP {prefix}_{metric} {help_text}", f"# TYPE {prefix}_{metric} {kind}"]
+            for flow, name, entry in rows:
+                lines.append(f'{prefix}_{metric}{{call="{name}",flow="{flow}"}} {entry[field]}')
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+
+REGISTRY = MetricsRegistry()
+
+
+class Span:
+    """Values attached to one instrumented call; fill them in with set()."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.values = {}
+
+    def set(self, **values):
+        """prompt_tokens, completion_tokens, bytes_in, bytes_out, cache_hits, cache_misses, cost_usd."""
+        self.values.update(values)
+        return self
+
+
+class instrument:
+    """Time a call into REGISTRY. Use as `@instrument(name)` or `with instrument(name) as span:`."""
+
+    def __init__(self, name: str, registry: MetricsRegistry = REGISTRY):
+        self.name = name
+        self.registry = registry
+        self._spans = []   # stack, so one instance can be entered recursively
+
+    def __enter__(self) -> Span:
+        span = Span(self.name)
+        self._spans.append((span, time.perf_counter()))
+        return span
+
+    def __exit__(self, exc_type, exc, tb):
+        span, start_time = self._spans.pop()
+        self.registry.record(self.name, time.perf_counter() - start_time, error=exc_type is not None, **span.values)
+        return False
+
+    def __call__(self, fn):
+        name, registry = self.name, self.registry
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with instrument(name, registry):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with instrument(name, registry):
+                return fn(*args, **kwargs)
+        return wrapper
+
+
+def current_flow() -> str:
+    return _current_flow.get()
+
+
+@contextmanager
+def flow(name: str):
+    """Attribute every call made inside the block (this thread or task) to flow `name`."""
+    token = _current_flow.set(name)
+    try:
+        yield
+    finally:
+        _current_flow.reset(token)
+
+
+def record_openai_usage(span: Span, model: str, response, images: int = 0):
+    """Tokens and estimated cost from an OpenAI response's `usage`, if it has one."""
+    usage = getattr(response, "usage", None)
+    prompt_tokens = (getattr(usage, "prompt_tokens", None) or getattr(usage, "input_tokens", None) or 0) if usage else 0
+    completion_tokens = (getattr(usage, "completion_tokens", None) or getattr(usage, "output_tokens", None) or 0) if usage else 0
+    span.set(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens,
+             cost_usd=cost_usd(model, prompt_tokens, completion_tokens, images))
+
+
+def snapshot() -> dict:
+    return REGISTRY.snapshot()
+
+
+def to_json(indent: int = 2) -> str:
+    return REGISTRY.to_json(indent)
+
+
+def to_prometheus() -> str:
+    return REGISTRY.to_prometheus()
+
+
+def serve(port: int, host: str = "0.0.0.0"):
+    """Serve /metrics (Prometheus text) and /metrics.json from a daemon thread."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.startswith("/metrics.json"):
+                body, content_type = to_json().encode(), "application/json"
+            elif self.path.startswith("/metrics"):
+                body, content_type = to_prometheus().encode(), "text/plain; version=0.0.4"
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    print(f"📈 Metrics on http://{host}:{port}/metrics")
+    return server
@@ -0,0 +1,127 @@
+"""
+Joint outfit scoring across categories.
+
+An outfit takes one candidate from each category. Its score is the sum of the
+cosine similarities between every pair of its items, plus (optionally)
+each item's own relevance score, e.g. its kNN score for the user's prompt.
+Because the pairwise sum is linear in the item vectors, extending a partial
+outfit by every candidate of the next category costs one matrix product:
+
+    gain = relevance + (sum of chosen vectors) @ candidates.T
+
+compose_outfits() runs a beam search over the categories with that product.
+It keeps the best `beam_width` partial outfits per step, so hundreds of
+candidates per category take a few milliseconds instead of the full
+cross product. With unique=True it searches once per outfit and rules out
+items already used.
+"""
+import numpy as np
+
+
+def _normalize(vectors) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+
+def _beam_search(categories: list, vectors: dict, relevance: dict, width: int):
+    first = categories[0]
+    order = np.argsort(-relevance[first])[:width]
+    beam_choices = order[:, None]                 # (beam, categories so far)
+    beam_scores = relevance[first][order]         # (beam,)
+    beam_sums = vectors[first][order]             # (beam, dim) sum of chosen vectors
+
+    for category in categories[1:]:
+        candidates = vectors[category]
+        gains = beam_sums @ candidates.T + relevance[category][None, :]   # (beam, n_candidates)
+        flat = (beam_scores[:, None] + gains).ravel()
+        keep = min(width, flat.size)
+        best = np.argpartition(-flat, keep - 1)[:keep]
+        best = best[np.argsort(-flat[best])]
+        beams, picks = np.divmod(best, candidates.shape[0])
+
+        beam_choices = np.concatenate([beam_choices[beams], picks[:, None]], axis=1)
+        beam_scores = flat[best]
+        beam_sums = beam_sums[beams] + candidates[picks]
+    return beam_scores, beam_choices
+
+
+# Relevance given to candidates already used when outfits must be unique
+_USED = -1e9
+
+
+def compose_outfits(vectors_by_category: dict, item_scores: dict = None, top_n: int = 5,
+                    beam_width: int = 64, relevance_weight: float = 1.0,
+                    unique: bool = False) -> list[tuple[float, dict]]:
+    """
+    Best full outfits as [(score, {category: candidate_index})], best first.
+
+    vectors_by_category: {category: (n_candidates, dim) embeddings}
+    item_scores:         optional {category: (n_candidates,) relevance scores}
+    unique:              no candidate appears in more than one returned outfit
+    """
+    categories = [c for c in vectors_by_category if len(vectors_by_category[c])]
+    if not categories:
+        return []
+    vectors = {c: _normalize(vectors_by_category[c]) for c in categories}
+    relevance = {
+        c: relevance_weight * np.asarray(item_scores[c], dtype=np.float32)
+        if item_scores and c in item_scores else np.zeros(len(vectors[c]), dtype=np.float32)
+        for c in categories
+    }
+
+    if not unique:
+        scores, choices = _beam_search(categories, vectors, relevance, max(beam_width, top_n))
+        return [(float(score), dict(zip(categories, map(int, row)))) for score, row in zip(scores[:top_n], choices)]
+
+    # One search per outfit, with the items of earlier outfits ruled out
+    outfits = []
+    relevance = {c: r.copy() for c, r in relevance.items()}
+    for _ in range(min(top_n, min(len(v) for v in vectors.values()))):
+        scores, choices = _beam_search(categories, vectors, relevance, beam_width)
+        if scores[0] <= _USED / 2:
+            break
+        picked = dict(zip(categories, map(int, choices[0])))
+        outfits.append((float(scores[0]), picked))
+        for c, i in picked.items():
+            relevance[c][i] = _USED
+    return outfits
+
+
+def hit_text(source: dict) -> str:
+    """Short description of a search hit, for embedding it when its vector is not returned."""
+    return f"{source.get('color') or ''} {source.get('sub_type') or source.get('type') or ''} from {source.get('brand') or ''}"
+
+
+def compose_items(items_by_category: dict, text_fn, score_fn=None, top_n: int = 3,
+                  **kwargs) -> list[tuple[float, dict]]:
+    """
+    compose_outfits() over arbitrary items: [(score, {category: item})].
+    text_fn(item) gives the text each item is embedded from (one CLIP batch for
+    all of them); score_fn(item), if given, its relevance.
+    """
+    from models.clip_model import generate_clip_embeddings
+
+    categories = [c for c, items in items_by_category.items() if items]
+    texts = [text_fn(item) for c in categories for item in items_by_category[c]]
+    if not texts:
+        return []
+    embeddings = generate_clip_embeddings(texts)
+
+    vectors, scores, start = {}, {}, 0
+    for c in categories:
+        items = items_by_category[c]
+        vectors[c] = embeddings[start:start + len(items)]
+        if score_fn is not None:
+            scores[c] = [score_fn(item) for item in items]
+        start += len(items)
+
+    outfits = compose_outfits(vectors, scores or None, top_n=top_n, **kwargs)
+    return [(score, {c: items_by_category[c][i] for c, i in picked.items()}) for score, picked in outfits]
+
+
+def outfits_from_hits(hits_by_category: dict, top_n: int = 3, **kwargs) -> list[tuple[float, dict]]:
+    """Joint outfits from per-category search hits, using the kNN scores as relevance."""
+    return compose_items(
+        hits_by_category, lambda hit: hit_text(hit["_source"]), lambda hit: hit.get("_score") or 0.0,
+        top_n=top_n, **kwargs
+    )
@@ -0,0 +1,185 @@
+"""
+Two-tier cache for LLM prompt parsing.
+
+Exact tier: results keyed by sha256(namespace, normalized prompt).
+Semantic tier: when there is no exact match, the prompt's CLIP text embedding
+is compared with those of the cached prompts. A cosine similarity of at least
+`similarity_threshold` counts as a hit, so "summer date night outfit" can
+reuse the answer for "Summer date-night outfit?".
+
+Cached values are structured, and CLIP barely tells "I have a top, suggest
+shoes" from "I have shoes, suggest a top". So the semantic tier only runs
+with a `signature_fn`, and only compares entries with the same signature
+(e.g. the garments and scenario the prompt names). Without one, the cache is
+exact-only.
+
+get() checks both tiers. A caller with a cheaper fallback than the semantic
+tier (which has to embed the prompt) can run get(prompt, semantic=False),
+then its fallback, then get_similar(prompt).
+
+Entries expire after `ttl` seconds and the least recently used are evicted
+past `max_entries`. Everything is persisted in SQLite, so the cache survives
+restarts. The namespace should change whenever the model or the system
+prompt does.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from utils.db import get_connection, transaction
+from utils.embeddings import normalize_text
+
+CACHE_DB_PATH = "data/prompt_cache.db"
+PROMPT_CACHE_TTL = float(os.getenv("PROMPT_CACHE_TTL", str(7 * 24 * 3600)))
+PROMPT_CACHE_SIMILARITY = float(os.getenv("PROMPT_CACHE_SIMILARITY", "0.96"))
+
+
+def _clip_embed(texts: list[str]) -> np.ndarray:
+    from models.clip_model import generate_clip_embeddings
+    return generate_clip_embeddings(texts)
+
+
+class PromptCache:
+    def __init__(self, namespace: str, db_path: str = CACHE_DB_PATH, ttl: float = PROMPT_CACHE_TTL,
+                 max_entries: int = 2000, similarity_threshold: float = PROMPT_CACHE_SIMILARITY,
+                 embed_fn=_clip_embed, signature_fn=None):
+        self.namespace = namespace
+        self.db_path = db_path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.similarity_threshold = similarity_threshold
+        # No signature, no semantic tier
+        self.embed_fn = embed_fn if signature_fn is not None else None
+        self.signature_fn = signature_fn
+        self.hits = {"exact": 0, "semantic": 0}
+        self.misses = {"exact": 0, "semantic": 0}
+        self._entries = OrderedDict()   # key -> (value, created_at, unit embedding or None, signature)
+        self._lock = threading.Lock()
+        self._loaded = False
+
+    def key(self, prompt: str) -> str:
+        return hashlib.sha256(f"{self.namespace}\0{normalize_text(prompt)}".encode()).hexdigest()
+
+    def _load(self):
+        if self._loaded:
+            return
+        with transaction(self.db_path) as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS prompt_cache (
+                    key TEXT PRIMARY KEY,
+                    namespace TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    embedding BLOB,
+                    created_at REAL NOT NULL,
+                    last_used REAL NOT NULL
+                )
+            """)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(prompt_cache)")}
+            if "signature" not in columns:
+                conn.execute("ALTER TABLE prompt_cache ADD COLUMN signature TEXT")
+            conn.execute("DELETE FROM prompt_cache WHERE created_at < ?", (time.time() - self.ttl,))
+        rows = get_connection(self.db_path).execute(
+            "SELECT key, value, embedding, created_at, signature FROM prompt_cache WHERE namespace = ? "
+            "ORDER BY last_used DESC LIMIT ?",
+            (self.namespace, self.max_entries)
+        ).fetchall()
+        with self._lock:
+            for key, value, blob, created_at, signature in reversed(rows):
+                embedding = np.frombuffer(blob, dtype=np.float32) if blob else None
+                self._entries[key] = (json.loads(value), created_at, embedding, signature)
+            self._loaded = True
+
+    def _embed(self, prompt: str):
+        if self.embed_fn is None:
+            return None
+        vector = np.asarray(self.embed_fn([normalize_text(prompt)])[0], dtype=np.float32)
+        return vector / max(float(np.linalg.norm(vector)), 1e-12)
+
+    def _touch(self, key: str):
+        self._entries.move_to_end(key)
+        with transaction(self.db_path) as conn:
+            conn.execute("UPDATE prompt_cache SET last_used = ? WHERE key = ?", (time.time(), key))
+
+    def get(self, prompt: str, semantic: bool = True):
+        """Cached value for `prompt` (exact, then semantic unless `semantic` is False), or None."""
+        self._load()
+        key = self.key(prompt)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and time.time() - entry[1] <= self.ttl:
+                self.hits["exact"] += 1
+                self._touch(key)
+                return entry[0]
+            self.misses["exact"] += 1
+        return self.get_similar(prompt) if semantic else None
+
+    def get_similar(self, prompt: str):
+        """Value of the most similar cached prompt with the same signature, or None. Embeds `prompt`."""
+        if self.embed_fn is None:
+            return None
+        self._load()
+        signature = self.signature_fn(prompt)
+        query = self._embed(prompt)
+        now = time.time()
+        with self._lock:
+            live = [(k, e) for k, e in self._entries.items()
+                    if e[2] is not None and e[3] == signature and now - e[1] <= self.ttl]
+            if live:
+                scores = np.stack([e[2] for _, e in live]) @ query
+                best = int(np.argmax(scores))
+                if scores[best] >= self.similarity_threshold:
+                    self.hits["semantic"] += 1
+                    self._touch(live[best][0])
+                    return live[best][1][0]
+            self.misses["semantic"] += 1
+        return None
+
+    def put(self, prompt: str, value):
+        """Store a JSON-serializable `value` for `prompt`."""
+        self._load()
+        key = self.key(prompt)
+        embedding = self._embed(prompt)
+        signature = self.signature_fn(prompt) if self.signature_fn else None
+        now = time.time()
+        with self._lock:
+            self._entries[key] = (value, now, embedding, signature)
+            self._entries.move_to_end(key)
+            evicted = []
+            while len(self._entries) > self.max_entries:
+                evicted.append(self._entries.popitem(last=False)[0])
+        with transaction(self.db_path) as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO prompt_cache "
+                "(key, namespace, value, embedding, created_at, last_used, signature) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, self.namespace, json.dumps(value),
+                 None if embedding is None else embedding.tobytes(), now, now, signature)
+            )
+            conn.executemany("DELETE FROM prompt_cache WHERE key = ?", [(k,) for k in evicted])
+
+    def stats(self) -> dict:
+        return {
+            "namespace": self.namespace,
+            "exact_hits": self.hits["exact"],
+            "semantic_hits": self.hits["semantic"],
+            "exact_misses": self.misses["exact"],
+            "semantic_misses": self.misses["semantic"],
+            "entries": len(self._entries),
+        }
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_prompt_cache(namespace: str, signature_fn=None) -> PromptCache:
+    """Process-wide cache instance for `namespace` (the first call's signature_fn sticks)."""
+    with _caches_lock:
+        if namespace not in _caches:
+            _caches[namespace] = PromptCache(namespace, signature_fn=signature_fn)
+        return _caches[namespace]
@@ -0,0 +1,149 @@
+"""
+Streaming bulk indexer for the recommendation search index.
+
+    python -m utils.search_indexer utils/Generated_Wardrobe_Items.csv --chunk-size 500 --threads 4
+
+The CSV is read `chunk_size` rows at a time and each chunk is embedded with
+one batched CLIP call. Against Elasticsearch the documents then go out
+through `helpers.parallel_bulk`, so the next chunk is being embedded while
+earlier ones are in flight, and refreshes are switched off for the length of
+the load. The local vector store gets one upsert per chunk. Memory stays
+bounded by the chunk size whatever the file size.
+"""
+import argparse
+import datetime
+import math
+import os
+import time
+
+import pandas as pd
+
+from models.clip_model import generate_clip_embeddings
+from utils.db import WARDROBE_DIR
+from utils.embeddings import item_embedding_text
+from utils.vector_store import ElasticsearchVectorStore, VectorStore, get_vector_store
+
+
+def _clean(value):
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+    return value
+
+
+def _date(value):
+    """ISO 8601 for the `date` mapping; SQLite's CURRENT_TIMESTAMP ("YYYY-MM-DD HH:MM:SS") included."""
+    value = _clean(value)
+    if value is None:
+        return None
+    try:
+        return datetime.datetime.fromisoformat(str(value).strip()).isoformat()
+    except ValueError:
+        return None
+
+
+def _image_url(row: dict):
+    """The item's image URL, or the path of its saved photo when it has no usable URL."""
+    url = _clean(row.get("image_url"))
+    if isinstance(url, str) and url.startswith(("http://", "https://")):
+        return url
+    filename = _clean(row.get("filename"))
+    return os.path.join(WARDROBE_DIR, str(row["user_id"]), filename) if filename else None
+
+
+def to_document(row: dict) -> dict:
+    """Search-index document for one wardrobe item (CSV row or SQLite row)."""
+    return {
+        "id": str(row["id"]),
+        "user_id": row["user_id"],
+        "filename": _clean(row.get("filename")),
+        "image_url": _image_url(row),
+        "type": _clean(row.get("type")),
+        "sub_type": _clean(row.get("sub_type")),
+        "color": _clean(row.get("color")),
+        "color_hex": _clean(row.get("color_hex")),
+        "material": _clean(row.get("material")),
+        "pattern": _clean(row.get("pattern")),
+        "size": _clean(row.get("size")),
+        "brand": _clean(row.get("brand")),
+        "style": _clean(row.get("style")),
+        "season": _clean(row.get("season")),
+        "mood": _clean(row.get("mood")),
+        "favorite": bool(int(float(_clean(row.get("favorite")) or 0))),
+        "date_added": _date(row.get("date_added")),
+        "last_worn": _date(row.get("last_worn")),
+        "wear_count": int(float(_clean(row.get("wear_count")) or 0)),
+    }
+
+
+def read_csv_chunks(path: str, chunk_size: int = 500):
+    for frame in pd.read_csv(path, chunksize=chunk_size):
+        yield [to_document(row) for row in frame.to_dict("records")]
+
+
+def embed_chunks(chunks, batch_size: int = 64):
+    """Yield (documents, vectors) with one batched CLIP pass per chunk."""
+    for documents in chunks:
+        if documents:
+            yield documents, generate_clip_embeddings([item_embedding_text(d) for d in documents], batch_size)
+
+
+def index_chunks(chunks, store: VectorStore, chunk_size: int = 500, thread_count: int = 4,
+                 embed_batch_size: int = 64) -> dict:
+    """Embed and index document chunks into `store`. Returns throughput stats."""
+    start_time = time.time()
+    indexed = failed = 0
+
+    with store.bulk_load():
+        if isinstance(store, ElasticsearchVectorStore):
+            from elasticsearch import helpers
+            actions = (
+                {"_index": store.index_name, "_id": document["id"],
+                 "_source": {**document, store.field: vector.tolist()}}
+                for documents, vectors in embed_chunks(chunks, embed_batch_size)
+                for document, vector in zip(documents, vectors)
+            )
+            for ok, info in helpers.parallel_bulk(
+                store.es, actions, thread_count=thread_count, chunk_size=chunk_size, raise_on_error=False
+            ):
+                if ok:
+                    indexed += 1
+                else:
+                    failed += 1
+                    print(f"⚠️ Failed to index: {info}")
+        else:
+            for documents, vectors in embed_chunks(chunks, embed_batch_size):
+                store.upsert(documents, vectors)
+                indexed += len(documents)
+
+    elapsed = time.time() - start_time
+    return {
+        "indexed": indexed,
+        "failed": failed,
+        "seconds": elapsed,
+        "docs_per_second": indexed / max(elapsed, 1e-9),
+    }
+
+
+def index_csv(csv_path: str, index_name: str = "digital_wardrobe", store: VectorStore = None,
+              chunk_size: int = 500, thread_count: int = 4, embed_batch_size: int = 64) -> dict:
+    store = store or get_vector_store(index_name)
+    stats = index_chunks(read_csv_chunks(csv_path, chunk_size), store, chunk_size, thread_count, embed_batch_size)
+    print(f"✅ Indexed {stats['indexed']} items into '{index_name}' in {stats['seconds']:.2f}s "
+          f"({stats['docs_per_second']:.0f} docs/s, {stats['failed']} failed)")
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk index a wardrobe CSV into the recommendation search index.")
+    parser.add_argument("path", help="Wardrobe CSV export")
+    parser.add_argument("--index", default="digital_wardrobe", help="Index name")
+    parser.add_argument("--chunk-size", type=int, default=500, help="Rows per embedding batch and bulk request")
+    parser.add_argument("--threads", type=int, default=4, help="Parallel bulk requests (Elasticsearch only)")
+    parser.add_argument("--embed-batch-size", type=int, default=64, help="Texts per CLIP forward pass")
+    args = parser.parse_args()
+    index_csv(args.path, args.index, chunk_size=args.chunk_size, thread_count=args.threads,
+              embed_batch_size=args.embed_batch_size)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+Incremental SQLite → search index sync.
+
+Triggers on wardrobe_items append every insert, update and delete to
+`item_changes`. sync_once() reads the changes past the `search_sync_seq`
+watermark, collapses repeated changes to the same item, re-embeds and upserts
+the items that still exist, and deletes the rest from the vector store, in
+bulk. It then advances the watermark and prunes the log. Items the index
+rejects do not hold the log up: their ids go on a dead-letter list
+(`search_sync_failed`) and `--retry-failed` queues them again. Logging a
+wear does not enter the change log, so the indexed last_worn / wear_count are
+as of the item's last content change.
+
+start() runs this on a daemon thread every SYNC_INTERVAL seconds. notify()
+wakes it right away, e.g. after an item is saved. While the index is
+unreachable the worker backs off, doubling the wait up to SYNC_MAX_BACKOFF.
+One-off runs:
+
+    python -m utils.search_sync --once
+    python -m utils.search_sync --retry-failed
+"""
+import argparse
+import json
+import logging
+import os
+import threading
+
+from models.clip_model import generate_clip_embeddings
+from utils import db
+from utils.embeddings import item_embedding_text
+from utils.search_indexer import to_document
+from utils.vector_store import VectorStore, get_vector_store
+
+SYNC_INTERVAL = float(os.getenv("SEARCH_SYNC_INTERVAL", "2"))
+SYNC_MAX_BACKOFF = float(os.getenv("SEARCH_SYNC_MAX_BACKOFF", "300"))
+WATERMARK_KEY = "search_sync_seq"
+FAILED_KEY = "search_sync_failed"
+
+_wakeup = threading.Event()
+_worker = None
+_worker_lock = threading.Lock()
+_sync_lock = threading.Lock()
+
+logger = logging.getLogger(__name__)
+
+
+def failed_items() -> dict:
+    """Dead-letter list: {item_id: reason} for items the index rejected."""
+    return json.loads(db.get_meta(FAILED_KEY, "{}"))
+
+
+def _record_failures(failures: list[tuple]):
+    failed = failed_items()
+    for item_id, reason in failures:
+        logger.warning("Search index rejected item %s: %s", item_id, reason)
+        failed[str(item_id)] = str(reason)
+    db.set_meta(FAILED_KEY, json.dumps(failed))
+
+
+def retry_failed() -> int:
+    """Queue every dead-lettered item for the next sync. Returns how many were queued."""
+    failed = failed_items()
+    if failed:
+        db.requeue_item_changes(list(failed))
+        db.set_meta(FAILED_KEY, "{}")
+        notify()
+    return len(failed)
+
+
+def sync_once(store: VectorStore = None, index_name: str = "digital_wardrobe", batch_size: int = 500) -> dict:
+    """
+    Apply pending changes to `store` in batches. Returns counts of upserts,
+    deletes and failures. The store is only connected to when there is
+    something to apply.
+    """
+    stats = {"upserted": 0, "deleted": 0, "failed": 0}
+    with _sync_lock:
+        while True:
+            synced_up_to = int(db.get_meta(WATERMARK_KEY, 0))
+            changes = db.get_item_changes(synced_up_to, limit=batch_size)
+            if not changes:
+                return stats
+            store = store or get_vector_store(index_name)
+
+            # Only the current state of each item matters, not every intermediate change
+            item_ids = list(dict.fromkeys(item_id for _, item_id, _ in changes))
+            items = db.get_items_by_ids(item_ids)
+            documents = [to_document(items[item_id]) for item_id in item_ids if item_id in items]
+            removed = [item_id for item_id in item_ids if item_id not in items]
+
+            failures = []
+            if documents:
+                vectors = generate_clip_embeddings([item_embedding_text(d) for d in documents])
+                failures = store.upsert(documents, vectors) or []
+            if removed:
+                store.delete(removed)
+            if failures:
+                _record_failures(failures)
+
+            last_seq = changes[-1][0]
+            db.set_meta(WATERMARK_KEY, last_seq)
+            db.prune_item_changes(last_seq)
+            stats["upserted"] += len(documents) - len(failures)
+            stats["deleted"] += len(removed)
+            stats["failed"] += len(failures)
+
+
+def notify():
+    """Ask the background worker to sync now instead of at the next interval."""
+    _wakeup.set()
+
+
+def _run(index_name: str):
+    delay = SYNC_INTERVAL
+    while True:
+        _wakeup.wait(delay)
+        _wakeup.clear()
+        try:
+            sync_once(index_name=index_name)
+            delay = SYNC_INTERVAL
+        except Exception as e:
+            delay = min(delay * 2, SYNC_MAX_BACKOFF)
+            logger.warning("Search index sync failed, retrying in %.0fs: %s", delay, e)
+
+
+def start(index_name: str = "digital_wardrobe") -> threading.Thread:
+    """Start the background sync worker once per process."""
+    global _worker
+    with _worker_lock:
+        if _worker is None:
+            _worker = threading.Thread(target=_run, args=(index_name,), name="search-sync", daemon=True)
+            _worker.start()
+    return _worker
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sync wardrobe_items changes into the search index.")
+    parser.add_argument("--index", default="digital_wardrobe", help="Index name")
+    parser.add_argument("--once", action="store_true", help="Sync pending changes and exit")
+    parser.add_argument("--retry-failed", action="store_true", help="Queue dead-lettered items again, then sync")
+    args = parser.parse_args()
+
+    db.init_db()
+    if args.retry_failed:
+        print(f"🔁 Queued {retry_failed()} previously rejected items")
+    if args.once or args.retry_failed:
+        stats = sync_once(index_name=args.index)
+        print(f"✅ Synced {stats['upserted']} upserts and {stats['deleted']} deletes, {stats['failed']} rejected")
+        return
+    print(f"🔄 Syncing every {SYNC_INTERVAL:.0f}s, Ctrl+C to stop")
+    start(args.index).join()
+
+
+if __name__ == "__main__":
+    main()
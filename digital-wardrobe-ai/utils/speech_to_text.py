@@ -1,13 +1,13 @@
-from openai import OpenAI
-from dotenv import load_dotenv  # load environment variables from .env file
-load_dotenv()
+import os
+from services.openai_client import transcription as transcribe
 
 def get_text_from_speech(input_file):
-    client = OpenAI()
-    audio_file= open(input_file, "rb")
-    transcription = client.audio.transcriptions.create(
+    # Read up front so a retried request can resend the audio
+    with open(input_file, "rb") as audio_file:
+        audio = (os.path.basename(input_file), audio_file.read())
+    transcription = transcribe(
         model="gpt-4o-transcribe", 
-        file=audio_file
+        file=audio
     )
     print(transcription.text)
 
@@ -0,0 +1,631 @@
+"""
+Pluggable vector store behind `search_similar_items`.
+
+Every backend takes documents plus float32 vectors and answers k-nearest-
+neighbour queries by cosine similarity. Results come back as Elasticsearch-
+shaped hits ({"_id", "_score", "_source"}), so callers do not care which
+backend served them.
+
+    VECTOR_BACKEND=elasticsearch  the `digital_wardrobe` index on ELASTICSEARCH_HOST
+    VECTOR_BACKEND=local          LocalVectorStore under VECTOR_STORE_DIR
+
+The default is elasticsearch when ELASTICSEARCH_HOST is set, local otherwise.
+
+LocalVectorStore runs in-process. Vectors live in a memory-mapped .npy file.
+Queries scan the whole matrix exactly up to EXACT_SEARCH_MAX rows, and above
+that go through an HNSW graph persisted next to the vectors. The graph is
+extended by writes, never by queries: rows not linked yet are scanned
+exactly and merged into the graph results. It also works as a stand-in for
+Elasticsearch when testing.
+"""
+import heapq
+import json
+import math
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+
+import numpy as np
+
+from utils.metrics import instrument
+
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND") or ("elasticsearch" if os.getenv("ELASTICSEARCH_HOST") else "local")
+VECTOR_STORE_DIR = os.getenv("VECTOR_STORE_DIR", "data/vector_store")
+EXACT_SEARCH_MAX = int(os.getenv("VECTOR_EXACT_SEARCH_MAX", "20000"))
+# Rows linked into the graph per lock hold, so queries interleave with a build
+GRAPH_BUILD_CHUNK = 64
+# Minimum seconds between graph checkpoints outside bulk loads; unsaved rows are relinked on load
+GRAPH_SAVE_INTERVAL = float(os.getenv("VECTOR_GRAPH_SAVE_INTERVAL", "60"))
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def _cosine_score(similarity: float) -> float:
+    # Same scale Elasticsearch uses for cosine dense_vector fields
+    return (1.0 + float(similarity)) / 2.0
+
+
+class VectorStore(ABC):
+    """Interface shared by every backend; a backend missing a method cannot be constructed."""
+
+    @abstractmethod
+    def upsert(self, documents: list[dict], vectors: np.ndarray) -> list[tuple]:
+        """
+        Insert or replace documents (keyed by document["id"]) with their vectors.
+        Returns [(id, reason)] for documents the backend rejected; the rest are stored.
+        """
+
+    @abstractmethod
+    def delete(self, ids: list[str]):
+        """Remove the documents with these ids; unknown ids are ignored."""
+
+    def knn_many(self, queries: list[tuple], k: int = 10, num_candidates: int = 100,
+                 source_fields: list[str] = None) -> list[list[dict]]:
+        """knn() for several (vector, filters) pairs; hits lists come back in the same order."""
+        return [self.knn(vector, k, num_candidates, filters, source_fields) for vector, filters in queries]
+
+    @contextmanager
+    def bulk_load(self):
+        """Wrap a large load; backends use it to defer per-write overheads until the end."""
+        yield
+
+    @abstractmethod
+    def knn(self, vector, k: int = 10, num_candidates: int = 100,
+            filters: dict = None, source_fields: list[str] = None) -> list[dict]:
+        """
+        The `k` documents closest to `vector`, best first, as ES-style hits.
+        `filters` ({field: value or [values]}) restricts the candidates before
+        ranking; `source_fields` trims each hit's _source to those fields.
+        """
+
+
+class ElasticsearchVectorStore(VectorStore):
+    def __init__(self, es, index_name: str = "digital_wardrobe", field: str = "embedding"):
+        self.es = es
+        self.index_name = index_name
+        self.field = field
+
+    @instrument("elasticsearch.bulk")
+    def upsert(self, documents: list[dict], vectors: np.ndarray):
+        from elasticsearch import helpers
+        actions = (
+            {"_index": self.index_name, "_id": document["id"], "_source": {**document, self.field: vector.tolist()}}
+            for document, vector in zip(documents, np.asarray(vectors, dtype=np.float32))
+        )
+        # One bad document (e.g. a field the mapping rejects) must not fail the whole batch
+        _, errors = helpers.bulk(self.es, actions, raise_on_error=False)
+        return [
+            (info.get("_id"), (info.get("error") or {}).get("reason") or info.get("error"))
+            for info in (next(iter(error.values())) for error in errors)
+        ]
+
+    def delete(self, ids: list[str]):
+        from elasticsearch import helpers
+        actions = ({"_op_type": "delete", "_index": self.index_name, "_id": doc_id} for doc_id in ids)
+        helpers.bulk(self.es, actions, raise_on_error=False)
+
+    @contextmanager
+    def bulk_load(self):
+        """Switch off periodic refreshes during the load; restore and refresh once afterwards."""
+        settings = self.es.indices.get_settings(
+            index=self.index_name, name="index.refresh_interval", flat_settings=True
+        )
+        previous = settings[self.index_name]["settings"].get("index.refresh_interval")
+        self.es.indices.put_settings(index=self.index_name, settings={"index.refresh_interval": "-1"})
+        try:
+            yield
+        finally:
+            # None resets the index to the cluster default
+            self.es.indices.put_settings(index=self.index_name, settings={"index.refresh_interval": previous})
+            self.es.indices.refresh(index=self.index_name)
+
+    def _knn_body(self, vector, k: int, num_candidates: int, filters: dict, source_fields: list[str]) -> dict:
+        knn = {
+            "field": self.field,
+            "query_vector": np.asarray(vector, dtype=np.float32).tolist(),
+            "k": k,
+            "num_candidates": max(num_candidates, k),
+        }
+        if filters:
+            # Inside the knn clause this is a pre-filter: candidates are drawn from matching docs only
+            knn["filter"] = {"bool": {"filter": [
+                {"terms": {field: value}} if isinstance(value, (list, tuple, set)) else {"term": {field: value}}
+                for field, value in filters.items()
+            ]}}
+        return {"knn": knn, "size": k, "_source": source_fields if source_fields is not None else True}
+
+    @instrument("elasticsearch.knn")
+    def knn(self, vector, k: int = 10, num_candidates: int = 100,
+            filters: dict = None, source_fields: list[str] = None) -> list[dict]:
+        body = self._knn_body(vector, k, num_candidates, filters, source_fields)
+        return self.es.search(index=self.index_name, body=body)["hits"]["hits"]
+
+    @instrument("elasticsearch.msearch")
+    def knn_many(self, queries: list[tuple], k: int = 10, num_candidates: int = 100,
+                 source_fields: list[str] = None) -> list[list[dict]]:
+        """All queries in one _msearch round trip."""
+        searches = []
+        for vector, filters in queries:
+            searches.append({"index": self.index_name})
+            searches.append(self._knn_body(vector, k, num_candidates, filters, source_fields))
+        responses = self.es.msearch(searches=searches)["responses"]
+        results = []
+        for response in responses:
+            if "error" in response:
+                print(f"⚠️ kNN search failed: {response['error']}")
+                results.append([])
+            else:
+                results.append(response["hits"]["hits"])
+        return results
+
+
+class HNSWIndex:
+    """
+    Hierarchical navigable small-world graph over rows of a normalized float32
+    matrix; similarity is the dot product. Neighbour lists are plain Python
+    lists while building and are saved as padded int32 arrays.
+    """
+
+    def __init__(self, m: int = 16, ef_construction: int = 100, seed: int = 0):
+        self.m = m
+        self.m0 = 2 * m
+        self.ef_construction = ef_construction
+        self.level_mult = 1 / math.log(m)
+        self.rng = np.random.default_rng(seed)
+        self.levels = []
+        self.layers = []  # layers[l] = {node: [neighbours]}
+        self.entry = None
+
+    def __len__(self):
+        return len(self.levels)
+
+    def _search_layer(self, vectors, query, entry_points, ef: int, layer: int):
+        graph = self.layers[layer]
+        visited = set(entry_points)
+        entry_scores = (vectors[entry_points] @ query).tolist()
+        candidates = [(-score, node) for score, node in zip(entry_scores, entry_points)]
+        heapq.heapify(candidates)
+        best = [(score, node) for score, node in zip(entry_scores, entry_points)]
+        heapq.heapify(best)
+        while len(best) > ef:
+            heapq.heappop(best)
+
+        while candidates:
+            neg_score, node = heapq.heappop(candidates)
+            if -neg_score < best[0][0] and len(best) >= ef:
+                break
+            fresh = [n for n in graph.get(node, ()) if n not in visited]
+            if not fresh:
+                continue
+            visited.update(fresh)
+            for score, neighbour in zip((vectors[fresh] @ query).tolist(), fresh):
+                if len(best) < ef or score > best[0][0]:
+                    heapq.heappush(candidates, (-score, neighbour))
+                    heapq.heappush(best, (score, neighbour))
+                    if len(best) > ef:
+                        heapq.heappop(best)
+        return sorted(best, reverse=True)
+
+    def _prune(self, vectors, node: int, layer: int):
+        limit = self.m0 if layer == 0 else self.m
+        neighbours = self.layers[layer][node]
+        if len(neighbours) > limit:
+            scores = vectors[neighbours] @ vectors[node]
+            keep = np.argsort(-scores)[:limit]
+            self.layers[layer][node] = [neighbours[i] for i in keep]
+
+    def add(self, vectors: np.ndarray, node: int):
+        """Link row `node` of `vectors` into the graph (rows must be added in order)."""
+        level = int(-math.log(1.0 - self.rng.random()) * self.level_mult)
+        self.levels.append(level)
+        while len(self.layers) <= level:
+            self.layers.append({})
+        for layer in range(level + 1):
+            self.layers[layer][node] = []
+
+        if self.entry is None:
+            self.entry = node
+            return
+
+        query = vectors[node]
+        entry_points = [self.entry]
+        top = self.levels[self.entry]
+        for layer in range(top, level, -1):
+            entry_points = [self._search_layer(vectors, query, entry_points, 1, layer)[0][1]]
+
+        for layer in range(min(level, top), -1, -1):
+            found = self._search_layer(vectors, query, entry_points, self.ef_construction, layer)
+            limit = self.m0 if layer == 0 else self.m
+            neighbours = [n for _, n in found[:limit]]
+            self.layers[layer][node] = neighbours
+            for neighbour in neighbours:
+                self.layers[layer][neighbour].append(node)
+                self._prune(vectors, neighbour, layer)
+            entry_points = [n for _, n in found]
+
+        if level > top:
+            self.entry = node
+
+    def search(self, vectors: np.ndarray, query: np.ndarray, k: int, ef: int) -> list[tuple[float, int]]:
+        if self.entry is None:
+            return []
+        entry_points = [self.entry]
+        for layer in range(self.levels[self.entry], 0, -1):
+            entry_points = [self._search_layer(vectors, query, entry_points, 1, layer)[0][1]]
+        return self._search_layer(vectors, query, entry_points, max(ef, k), 0)[:k]
+
+    def save(self, path: str):
+        arrays = {
+            "levels": np.asarray(self.levels, dtype=np.int32),
+            "entry": np.asarray([-1 if self.entry is None else self.entry], dtype=np.int64),
+            "params": np.asarray([self.m, self.ef_construction], dtype=np.int32),
+        }
+        for layer, graph in enumerate(self.layers):
+            width = self.m0 if layer == 0 else self.m
+            nodes = np.fromiter(graph.keys(), dtype=np.int32, count=len(graph))
+            neighbours = np.full((len(graph), width), -1, dtype=np.int32)
+            for row, links in enumerate(graph.values()):
+                neighbours[row, :len(links)] = links
+            arrays[f"nodes_{layer}"] = nodes
+            arrays[f"neighbours_{layer}"] = neighbours
+        np.savez(path, **arrays)
+
+    @classmethod
+    def load(cls, path: str) -> "HNSWIndex":
+        data = np.load(path)
+        m, ef_construction = (int(v) for v in data["params"])
+        index = cls(m=m, ef_construction=ef_construction)
+        index.levels = data["levels"].tolist()
+        entry = int(data["entry"][0])
+        index.entry = None if entry < 0 else entry
+        layer = 0
+        while f"nodes_{layer}" in data:
+            index.layers.append({
+                int(node): [int(n) for n in row if n >= 0]
+                for node, row in zip(data[f"nodes_{layer}"], data[f"neighbours_{layer}"])
+            })
+            layer += 1
+        return index
+
+
+class LocalVectorStore(VectorStore):
+    """
+    Embedded store under `path`:
+
+        vectors.npy  memmap, one row per upserted document
+        docs.jsonl   append-only log: {"id", "source"} per row, {"deleted": row} per tombstone
+        hnsw.npz     graph checkpoint over the first len(graph) rows
+
+    Replaced or deleted rows are tombstoned rather than moved, so row numbers
+    in the graph stay valid; compact() rewrites them. Writes only append to
+    the log, and the graph is extended after them on a background thread
+    (synchronously at the end of bulk_load()).
+    """
+
+    def __init__(self, path: str, dim: int = 512, exact_max: int = EXACT_SEARCH_MAX):
+        self.path = path
+        self.dim = dim
+        self.exact_max = exact_max
+        self._lock = threading.RLock()
+        self._vectors = None
+        self.count = 0
+        self.ids = []
+        self.sources = []
+        self.deleted = set()
+        self._rows = {}
+        self._postings = {}
+        self._hnsw = None
+        self._bulk_depth = 0
+        self._pending = []          # log lines not yet appended to docs.jsonl
+        self._building = False
+        self._graph_saved_at = 0.0
+        self._load()
+
+    # ----- Persistence -----
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def _load(self):
+        if os.path.exists(self._file("docs.jsonl")):
+            with open(self._file("docs.jsonl"), encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue   # torn last line after a crash
+                    if "deleted" in entry:
+                        self.deleted.add(entry["deleted"])
+                    else:
+                        self.ids.append(entry["id"])
+                        self.sources.append(entry["source"])
+        elif os.path.exists(self._file("docs.json")):
+            # Older stores kept everything in one JSON document; convert it to the log once
+            with open(self._file("docs.json"), encoding="utf-8") as f:
+                docs = json.load(f)
+            self.ids, self.sources, self.deleted = docs["ids"], docs["sources"], set(docs["deleted"])
+            self._rewrite_log()
+            os.remove(self._file("docs.json"))
+        else:
+            return
+        self.count = len(self.ids)
+        self._rows = {doc_id: row for row, doc_id in enumerate(self.ids) if row not in self.deleted}
+        self._vectors = np.load(self._file("vectors.npy"), mmap_mode="r+")
+        self.dim = self._vectors.shape[1]
+        if os.path.exists(self._file("hnsw.npz")):
+            graph = HNSWIndex.load(self._file("hnsw.npz"))
+            self._hnsw = graph if len(graph) <= self.count else None
+        self._schedule_graph()
+
+    def _rewrite_log(self):
+        os.makedirs(self.path, exist_ok=True)
+        tmp = self._file("docs.jsonl.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            for doc_id, source in zip(self.ids, self.sources):
+                f.write(json.dumps({"id": doc_id, "source": source}) + "\n")
+            for row in sorted(self.deleted):
+                f.write(json.dumps({"deleted": row}) + "\n")
+        os.replace(tmp, self._file("docs.jsonl"))
+        self._pending = []
+
+    @contextmanager
+    def bulk_load(self):
+        """Append to the log once at the end and link the new rows into the graph before returning."""
+        with self._lock:
+            self._bulk_depth += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._bulk_depth -= 1
+            self.save()
+            if self._needs_graph():
+                self.build_graph()
+
+    def save(self):
+        """Flush vector rows and append pending log lines; O(changes), not O(store)."""
+        with self._lock:
+            if self._bulk_depth or not self._pending:
+                return
+            os.makedirs(self.path, exist_ok=True)
+            if self._vectors is not None:
+                self._vectors.flush()
+            with open(self._file("docs.jsonl"), "a", encoding="utf-8") as f:
+                f.writelines(line + "\n" for line in self._pending)
+            self._pending = []
+
+    def _save_graph(self, force: bool = False):
+        with self._lock:
+            if self._hnsw is None or (not force and time.monotonic() - self._graph_saved_at < GRAPH_SAVE_INTERVAL):
+                return
+            os.makedirs(self.path, exist_ok=True)
+            self._hnsw.save(self._file("hnsw.npz"))
+            self._graph_saved_at = time.monotonic()
+
+    def _reserve(self, rows: int):
+        capacity = 0 if self._vectors is None else self._vectors.shape[0]
+        if self.count + rows <= capacity:
+            return
+        os.makedirs(self.path, exist_ok=True)
+        new_capacity = max(1024, capacity * 2, self.count + rows)
+        tmp = self._file("vectors.npy.tmp")
+        grown = np.lib.format.open_memmap(tmp, mode="w+", dtype=np.float32, shape=(new_capacity, self.dim))
+        if self.count:
+            grown[:self.count] = self._vectors[:self.count]
+        grown.flush()
+        del grown
+        self._vectors = None
+        os.replace(tmp, self._file("vectors.npy"))
+        self._vectors = np.load(self._file("vectors.npy"), mmap_mode="r+")
+
+    # ----- Writes -----
+
+    def upsert(self, documents: list[dict], vectors: np.ndarray):
+        vectors = _normalize(vectors)
+        with self._lock:
+            self._reserve(len(documents))
+            for document, vector in zip(documents, vectors):
+                old = self._rows.get(document["id"])
+                if old is not None:
+                    self.deleted.add(old)
+                    self._pending.append(json.dumps({"deleted": old}))
+                row = self.count
+                self._vectors[row] = vector
+                self.ids.append(document["id"])
+                self.sources.append(document)
+                self._pending.append(json.dumps({"id": document["id"], "source": document}))
+                self._rows[document["id"]] = row
+                for field, postings in self._postings.items():
+                    postings.setdefault(document.get(field), []).append(row)
+                self.count += 1
+            self.save()
+            if not self._bulk_depth:
+                self._schedule_graph()
+        return []
+
+    def delete(self, ids: list[str]):
+        with self._lock:
+            for doc_id in ids:
+                row = self._rows.pop(doc_id, None)
+                if row is not None:
+                    self.deleted.add(row)
+                    self._pending.append(json.dumps({"deleted": row}))
+            self.save()
+
+    def compact(self):
+        """Drop tombstoned rows and rebuild the graph from the live ones."""
+        with self._lock:
+            live = [row for row in range(self.count) if row not in self.deleted]
+            documents = [self.sources[row] for row in live]
+            vectors = np.array(self._vectors[live]) if live else np.empty((0, self.dim), np.float32)
+            for name in ("vectors.npy", "docs.jsonl", "hnsw.npz"):
+                if os.path.exists(self._file(name)):
+                    os.remove(self._file(name))
+            self._vectors, self.count, self.ids, self.sources = None, 0, [], []
+            self.deleted, self._rows, self._postings, self._hnsw = set(), {}, {}, None
+            self._pending = []
+            self._bulk_depth += 1
+            try:
+                if documents:
+                    self.upsert(documents, vectors)
+            finally:
+                self._bulk_depth -= 1
+            self.save()
+        # Relinked outside the lock; queries scan exactly until the graph catches up
+        if self._needs_graph():
+            self.build_graph()
+
+    # ----- Graph maintenance -----
+
+    def _needs_graph(self) -> bool:
+        with self._lock:
+            graphed = len(self._hnsw) if self._hnsw is not None else 0
+            return graphed < self.count and (self._hnsw is not None or self.count > self.exact_max)
+
+    def _link_rows(self, limit: int) -> int:
+        """Link up to `limit` unlinked rows into the graph (lock held). Returns how many were linked."""
+        if self._hnsw is None:
+            self._hnsw = HNSWIndex()
+        start = len(self._hnsw)
+        end = min(self.count, start + limit)
+        vectors = np.asarray(self._vectors)
+        for row in range(start, end):
+            self._hnsw.add(vectors, row)
+        return end - start
+
+    def build_graph(self):
+        """Link every unlinked row now and checkpoint the graph, a chunk per lock hold."""
+        while True:
+            with self._lock:
+                if not self._link_rows(GRAPH_BUILD_CHUNK):
+                    break
+        self._save_graph(force=True)
+
+    def _schedule_graph(self):
+        """Extend the graph on a background thread if it is behind; one builder at a time."""
+        with self._lock:
+            if self._building or not self._needs_graph():
+                return
+            self._building = True
+        threading.Thread(target=self._graph_worker, name="hnsw-build", daemon=True).start()
+
+    def _graph_worker(self):
+        try:
+            while True:
+                with self._lock:
+                    if not self._link_rows(GRAPH_BUILD_CHUNK):
+                        # Cleared under the lock, so a write landing now schedules a new builder
+                        self._building = False
+                        break
+            self._save_graph()
+        except Exception as e:
+            with self._lock:
+                self._building = False
+            print(f"⚠️ HNSW graph build failed: {e}")
+
+    # ----- Queries -----
+
+    def _field_postings(self, field: str) -> dict:
+        """{value: [rows]} for `field`, built on first use and kept current by upsert()."""
+        if field not in self._postings:
+            postings = {}
+            for row, source in enumerate(self.sources):
+                postings.setdefault(source.get(field), []).append(row)
+            self._postings[field] = postings
+        return self._postings[field]
+
+    def _allowed_rows(self, filters: dict) -> np.ndarray:
+        allowed = None
+        for field, value in filters.items():
+            values = value if isinstance(value, (list, tuple, set)) else [value]
+            postings = self._field_postings(field)
+            rows = np.unique(np.concatenate(
+                [np.asarray(postings.get(v, []), dtype=np.int64) for v in values] or [np.empty(0, np.int64)]
+            ))
+            allowed = rows if allowed is None else np.intersect1d(allowed, rows, assume_unique=True)
+        if self.deleted:
+            allowed = np.setdiff1d(allowed, np.fromiter(self.deleted, dtype=np.int64), assume_unique=True)
+        return allowed
+
+    def _live_rows(self, start: int = 0) -> np.ndarray:
+        return np.setdiff1d(np.arange(start, self.count), np.fromiter(self.deleted, dtype=np.int64))
+
+    def _hits(self, scored, source_fields: list[str] = None) -> list[dict]:
+        hits = []
+        for score, row in scored:
+            source = self.sources[row]
+            if source_fields is not None:
+                source = {field: source.get(field) for field in source_fields}
+            hits.append({"_id": self.ids[row], "_score": _cosine_score(score), "_source": source})
+        return hits
+
+    def _exact(self, query: np.ndarray, rows: np.ndarray, k: int):
+        if not len(rows):
+            return []
+        scores = np.asarray(self._vectors[rows]) @ query
+        top = min(k, len(rows))
+        best = np.argpartition(-scores, top - 1)[:top]
+        best = best[np.argsort(-scores[best])]
+        return [(scores[i], int(rows[i])) for i in best]
+
+    @instrument("vector_store.local.knn")
+    def knn(self, vector, k: int = 10, num_candidates: int = 100,
+            filters: dict = None, source_fields: list[str] = None) -> list[dict]:
+        query = _normalize(vector)
+        with self._lock:
+            if filters:
+                rows = self._allowed_rows(filters)
+            elif self.count <= self.exact_max:
+                rows = self._live_rows()
+            else:
+                rows = None
+            graphed = len(self._hnsw) if self._hnsw is not None else 0
+            if rows is not None and len(rows) <= self.exact_max or not graphed:
+                # Small enough to scan, or no graph yet (one is being built off the query path)
+                rows = self._live_rows() if rows is None else rows
+                return self._hits(self._exact(query, rows, k), source_fields)
+
+            # Rows written since the graph last caught up are scanned exactly
+            tail = rows[rows >= graphed] if rows is not None else self._live_rows(graphed)
+            scored = self._exact(query, tail, k)
+
+            # Filtered-out and tombstoned rows still occupy graph candidates, so widen ef until k survive
+            allowed = None if rows is None else set(rows.tolist())
+            ef = max(num_candidates, k)
+            vectors = np.asarray(self._vectors)
+            while True:
+                found = self._hnsw.search(vectors, query, ef, ef=ef)
+                kept = [(score, row) for score, row in found
+                        if (row in allowed if allowed is not None else row not in self.deleted)]
+                if len(kept) >= k or ef >= graphed:
+                    break
+                ef *= 2
+            merged = sorted(kept + scored, key=lambda hit: -hit[0])[:k]
+            return self._hits(merged, source_fields)
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_vector_store(index_name: str = "digital_wardrobe", backend: str = None) -> VectorStore:
+    """Process-wide store for `index_name` on the configured backend."""
+    backend = backend or VECTOR_BACKEND
+    with _stores_lock:
+        key = (backend, index_name)
+        if key not in _stores:
+            if backend == "local":
+                _stores[key] = LocalVectorStore(os.path.join(VECTOR_STORE_DIR, index_name))
+            elif backend == "elasticsearch":
+                from services.elasticsearch_client import ensure_index, get_client
+                ensure_index(index_name)
+                _stores[key] = ElasticsearchVectorStore(get_client(), index_name)
+            else:
+                raise ValueError(f"Unknown VECTOR_BACKEND '{backend}' (expected local or elasticsearch)")
+        return _stores[key]
@@ -0,0 +1,72 @@
+"""
+Write-behind log of "wore this" events.
+
+record_wear() only appends to an in-memory buffer, so a click never waits on
+SQLite. A background thread writes the buffer to `wear_events` in a single
+transaction every FLUSH_INTERVAL seconds (or sooner once MAX_BUFFER events
+queue up) and folds the new events into wardrobe_items.last_worn / wear_count.
+Events still buffered when the process exits are flushed by an atexit hook.
+"""
+import atexit
+import datetime
+import os
+import threading
+
+from utils import db
+
+FLUSH_INTERVAL = float(os.getenv("WEAR_LOG_FLUSH_INTERVAL", "5"))
+MAX_BUFFER = 500
+
+_buffer: list[tuple] = []
+_lock = threading.Lock()
+_wakeup = threading.Event()
+_worker = None
+
+
+def record_wear(item_id: str, user_id: str, worn_at: str = None):
+    """Queue one wear event; it reaches the database on the next flush."""
+    global _worker
+    with _lock:
+        _buffer.append((item_id, user_id, worn_at or datetime.datetime.now().isoformat()))
+        size = len(_buffer)
+        if _worker is None:
+            _worker = threading.Thread(target=_run, name="wear-log-flusher", daemon=True)
+            _worker.start()
+    if size >= MAX_BUFFER:
+        _wakeup.set()
+
+
+def flush() -> int:
+    """Write buffered events and fold everything pending. Returns events folded."""
+    with _lock:
+        events = _buffer[:]
+        _buffer.clear()
+    if events:
+        try:
+            db.append_wear_events(events)
+        except Exception:
+            # Put them back so the next flush retries
+            with _lock:
+                _buffer[:0] = events
+            raise
+    elif not db.has_unfolded_wear_events():
+        return 0
+    return db.fold_wear_events()
+
+
+def _run():
+    while True:
+        _wakeup.wait(FLUSH_INTERVAL)
+        _wakeup.clear()
+        try:
+            flush()
+        except Exception as e:
+            print(f"⚠️ Wear log flush failed: {e}")
+
+
+def _flush_at_exit():
+    if _worker is not None:
+        flush()
+
+
+atexit.register(_flush_at_exit)
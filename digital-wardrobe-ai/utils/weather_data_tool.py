@@ -7,6 +7,7 @@ load_dotenv()
 import requests
 from typing import List, Optional
 from pydantic import BaseModel
+from utils.metrics import instrument
 
 # Base URL for the weather service
 BASE_URL = ("https://weather.visualcrossing.com"
@@ -43,7 +44,9 @@ def get_daily_forecast(input: GetDailyForecastInput) -> Optional[List[DailyForec
         "include": "days"      # Only daily data
     }
     try:
-        resp = requests.get(url, params=params, timeout=10)
+        with instrument("weather.forecast") as span:
+            resp = requests.get(url, params=params, timeout=10)
+            span.set(bytes_out=len(resp.content))
         resp.raise_for_status()
     except requests.RequestException as e:
         raise RuntimeError(f"Error fetching weather data: {e}")
@@ -1,17 +1,9 @@
 import streamlit as st
 from PIL import Image
-import os
 import sys
 
-from agents.wardrobe_agent import (
-    process_image,
-    extract_caption,
-    extract_ocr,
-    enrich_metadata_with_openai,
-    save_item_with_metadata
-)
-
-from services.vision_api import web_detection, extract_vision_metadata
+from agents.wardrobe_agent import save_item_with_metadata
+from agents.ingestion_pipeline import get_pipeline
 
 
 def render():
@@ -29,7 +21,8 @@ def render():
         "ocr_text": "",
         "enriched": {},
         "web_results": [],
-        "image_url": None
+        "image_url": None,
+        "ingest_timings": {}
     }.items():
         if key not in st.session_state:
             st.session_state[key] = default
@@ -59,36 +52,24 @@ def render():
 
         if st.button("✨ Process & Auto-Tag"):
             with st.spinner("Processing..."):
-                processed = process_image(img)
-                st.session_state.processed = processed
-                caption = extract_caption(processed)
-
-                temp_path = "data/user_wardrobes/user001/temp.jpg"
-                os.makedirs(os.path.dirname(temp_path), exist_ok=True)
-                processed.save(temp_path)
-
-                ocr_text = extract_ocr(processed)
-                vision_metadata = extract_vision_metadata(temp_path)
-                vision_labels = vision_metadata.get("labels", [])
-                vision_logos = vision_metadata.get("logos", [])
-
-                enriched = enrich_metadata_with_openai(
-                    caption,
-                    ocr_text,
-                    vision_labels,
-                    vision_logos
-                )
-
-                web_results = web_detection(temp_path)
-
-                st.session_state.caption = caption
-                st.session_state.ocr_text = ocr_text
-                st.session_state.enriched = enriched
-                st.session_state.web_results = web_results
+                # Caption, OCR, Vision and web detection run side by side once the image is cleaned
+                result = get_pipeline().run(img)
+
+                st.session_state.processed = result["processed"]
+                st.session_state.caption = result["caption"]
+                st.session_state.ocr_text = result["ocr_text"]
+                st.session_state.enriched = result["enriched"]
+                st.session_state.web_results = result["web_results"]
+                st.session_state.ingest_timings = result["timings"]
                 st.session_state.image_url = None
 
     if st.session_state.processed:
         st.image(st.session_state.processed, caption="🧼 Cleaned Image", use_container_width=True)
+        timings = st.session_state.ingest_timings
+        if timings:
+            st.caption("⏱️ Tagged in {:.1f}s — ".format(timings["total"]) + ", ".join(
+                f"{stage} {seconds:.1f}s" for stage, seconds in timings.items() if stage != "total"
+            ))
         enriched = st.session_state.enriched
 
         if st.session_state.web_results:
@@ -121,7 +102,7 @@ def render():
                 season = st.text_input("Season", enriched.get("season", ""))
                 mood = st.text_input("Mood", enriched.get("mood", ""))
                 tags_input = st.text_input("Tags (comma separated)", "daily,favorite")
-            first_url = (st.session_state.get("image_url") or [None])[0]
+            first_url = st.session_state.get("image_url")
 
             submitted = st.form_submit_button("💾 Save to Wardrobe")
             if submitted:
@@ -138,6 +119,7 @@ def render():
                         "style": style,
                         "season": season,
                         "mood": mood,
+                        "caption": st.session_state.caption,
                         "favorite": 1 if "favorite" in tags_input.lower() else 0,
                     }
                     tags = [t.strip() for t in tags_input.split(",") if t.strip()]
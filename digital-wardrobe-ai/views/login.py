@@ -1,16 +1,9 @@
-
-
-DB_PATH = 'data/wardrobe.db'
 import streamlit as st
-import sqlite3
 import bcrypt
+from utils.db import get_password_hash
 
 def verify_user(username: str, password: str):
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("SELECT id, password_hash FROM users WHERE username = ?", (username,))
-    result = c.fetchone()
-    conn.close()
+    result = get_password_hash(username)
 
     if result:
         user_id, password_hash = result
@@ -1,35 +1,26 @@
 import streamlit as st
 
-import sqlite3
 import uuid
 import datetime
 import os
 from PIL import Image
 import os, sys
 sys.path.append(os.path.abspath(os.path.join(__file__, '..', '..')))
-from ui.components.clothe_card import display_clothe_preview
+from ui.components.clothe_card import display_clothe_preview, display_clothe_tile
+from utils.db import get_user_items_page, search_items, get_username, get_facets
+from utils.wear_log import record_wear
 
 
-DB_PATH = 'data/wardrobe.db'
 UPLOAD_FOLDER = 'data/uploads'
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
-def get_user_items(user_id: str):
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    c = conn.cursor()
-    c.execute("SELECT * FROM wardrobe_items WHERE user_id = ?", (user_id,))
-    items = [dict(row) for row in c.fetchall()]
-    conn.close()
-    return items
+PAGE_SIZES = [12, 24, 48, 96]
+GRID_COLUMNS = 4
 
-def get_username(user_id: str) -> str:
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("SELECT username FROM users WHERE id = ?", (user_id,))
-    row = c.fetchone()
-    conn.close()
-    return row[0] if row else "User"
+
+def _wore_today(item: dict, user_id: str):
+    record_wear(item["id"], user_id)
+    st.toast(f"Logged: wore your {item['type']} today")
 
 
 def render():
@@ -65,10 +56,37 @@ def render():
 
 
 
-    # ----- Load Items -----
-    items = get_user_items(user_id)
+    # ----- Search by Photo -----
+    with st.expander("📷 Find similar in my closet"):
+        photo = st.file_uploader("Upload a photo", type=["jpg", "jpeg", "png"], key="closet_photo")
+        if photo:
+            # Embed each upload once; reruns (pagination, "Wore it") reuse the matches
+            photo_key = (user_id, photo.file_id)
+            if st.session_state.get("closet_photo_key") != photo_key:
+                from agents.wardrobe_agent import find_similar_in_closet
+                st.session_state.closet_photo_matches = find_similar_in_closet(
+                    user_id, Image.open(photo), k=GRID_COLUMNS * 2
+                )
+                st.session_state.closet_photo_key = photo_key
+            matches = st.session_state.closet_photo_matches
+            if not matches:
+                st.info("No photos indexed in your closet yet.")
+            for start in range(0, len(matches), GRID_COLUMNS):
+                for col, (item, score) in zip(st.columns(GRID_COLUMNS), matches[start:start + GRID_COLUMNS]):
+                    with col:
+                        display_clothe_tile(item)
+                        st.caption(f"Similarity {score:.2f}")
+
+    # ----- Free-text Search -----
+    search_text = st.text_input(
+        "🔎 Search your closet",
+        placeholder="e.g. red linen summer shirt",
+        key="closet_search"
+    ).strip()
 
     # ----- Sidebar Filters -----
+    facets = get_facets(user_id)
+
     with st.sidebar:
         st.header("Filters")
 
@@ -87,23 +105,23 @@ def render():
 
         for field, label in filter_fields.items():
             with st.expander(label):
-                all_values = sorted(set(item[field] for item in items if item.get(field)))
-                selected = [val for val in all_values if st.checkbox(val, key=f"{field}_{val}")]
+                selected = [
+                    val for val, count in facets[field]
+                    if st.checkbox(f"{val} ({count})", key=f"{field}_{val}")
+                ]
                 selected_filters[field] = selected
 
         # ----- Color Filter with Swatches -----
         with st.expander("🎨 Color"):
-            color_map = {}
-            for item in items:
-                color = item.get("color")
-                hex_code = item.get("color_hex")
-                if color and hex_code:
-                    color_map[color] = hex_code
+            color_map = facets["color_hex"]
             selected_colors = []
-            for color, hex_code in sorted(color_map.items()):
+            for color, count in facets["color"]:
+                hex_code = color_map.get(color)
+                if not hex_code:
+                    continue
                 col1, col2 = st.columns([5, 1])
                 with col1:
-                    if st.checkbox(color, key=f"color_{color}"):
+                    if st.checkbox(f"{color} ({count})", key=f"color_{color}"):
                         selected_colors.append(color)
                 with col2:
                     st.markdown(
@@ -111,37 +129,71 @@ def render():
                                     border: none; border-radius: 3px; margin-top: 7px;"></div>""",
                         unsafe_allow_html=True
                     )
+            selected_filters["color"] = selected_colors
 
         # ----- Tags Filter -----
         with st.expander("🏷️ Tags"):
-            tag_set = set()
-            for item in items:
-                if item.get("tags"):
-                    tag_set.update(tag.strip() for tag in item["tags"].split(","))
-            all_tags = sorted(tag_set)
-            selected_tags = [tag for tag in all_tags if st.checkbox(tag, key=f"tag_{tag}")]
-
-    # ----- Apply Filters -----
-    filtered_items = items
-
-    for field, selected in selected_filters.items():
-        if selected:
-            filtered_items = [item for item in filtered_items if item.get(field) in selected]
-
-    if selected_colors:
-        filtered_items = [item for item in filtered_items if item.get("color") in selected_colors]
-
-    if selected_tags:
-        filtered_items = [
-            item for item in filtered_items
-            if item.get("tags") and any(tag in item["tags"].split(",") for tag in selected_tags)
-        ]
+            match_all_tags = st.toggle("Match all selected tags", key="match_all_tags")
+            selected_tags = [
+                tag for tag, count in facets["tags"]
+                if st.checkbox(f"{tag} ({count})", key=f"tag_{tag}")
+            ]
+
+        # ----- Display Options -----
+        st.header("Display")
+        page_size = st.selectbox("Items per page", PAGE_SIZES, index=1, key="closet_page_size")
+        compact = st.toggle("Compact grid", key="closet_compact")
+
+    # ----- Keyset Pagination State -----
+    # One cursor per visited page; changing the query starts again from page 1
+    query_key = repr((search_text, selected_filters, selected_tags, match_all_tags, page_size))
+    if st.session_state.get("closet_query_key") != query_key:
+        st.session_state.closet_query_key = query_key
+        st.session_state.closet_cursors = [None]
+
+    cursors = st.session_state.closet_cursors
+    if search_text:
+        # Ranked matches, best first; narrow with more words rather than paging
+        filtered_items = search_items(
+            user_id, search_text, selected_filters, selected_tags, match_all_tags,
+            limit=page_size
+        )
+        next_cursor = None
+    else:
+        filtered_items, next_cursor = get_user_items_page(
+            user_id, selected_filters, selected_tags, match_all_tags,
+            after=cursors[-1], page_size=page_size
+        )
 
     # ----- Display Results -----
     if not filtered_items:
         st.info("No matching clothes found.")
+        return
+
+    page = len(cursors)
+    st.caption(f"Page {page}")
+
+    if compact:
+        for start in range(0, len(filtered_items), GRID_COLUMNS):
+            for col, item in zip(st.columns(GRID_COLUMNS), filtered_items[start:start + GRID_COLUMNS]):
+                with col:
+                    display_clothe_tile(item)
+                    st.button("👟 Wore it", key=f"wore_{item['id']}",
+                              on_click=_wore_today, args=(item, user_id))
     else:
         for item in filtered_items:
             with st.container():
                 display_clothe_preview(item)
+                st.button("👟 Wore it today", key=f"wore_{item['id']}",
+                          on_click=_wore_today, args=(item, user_id))
                 st.markdown("---")
+
+    prev_col, _, next_col = st.columns([1, 4, 1])
+    with prev_col:
+        if st.button("⬅️ Previous", disabled=page == 1):
+            cursors.pop()
+            st.rerun()
+    with next_col:
+        if st.button("Next ➡️", disabled=next_cursor is None):
+            cursors.append(next_cursor)
+            st.rerun()
@@ -4,7 +4,8 @@ import streamlit as st
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-import ui.recommendation_ui  # 👈 this triggers the full UI when called
+from ui import recommendation_ui
+
 
 def render():
-    pass
+    recommendation_ui.render()